@@ -5,6 +5,7 @@ Handles camera detection and WebRTC streaming
 
 from fastapi import APIRouter, HTTPException
 from typing import List
+import asyncio
 import sys
 from pathlib import Path
 
@@ -21,7 +22,7 @@ router = APIRouter()
 async def get_cameras():
     """Get list of available cameras."""
     try:
-        camera_indices = get_available_cameras()
+        camera_indices = await asyncio.to_thread(get_available_cameras)
         cameras = []
         
         for i, index in enumerate(camera_indices):
@@ -33,6 +34,8 @@ async def get_cameras():
         
         return cameras
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get cameras: {str(e)}")
 
@@ -58,5 +61,7 @@ async def test_camera(camera_index: int):
             "resolution": f"{frame.shape[1]}x{frame.shape[0]}"
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Camera test failed: {str(e)}") 
\ No newline at end of file
@@ -32,6 +32,8 @@ async def get_student(student_id: int):
         student_dict = dict(students)
         return StudentResponse(**student_dict)
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get student: {str(e)}")
 
@@ -42,6 +44,8 @@ async def get_student_progress(student_id: int, subject_id: int = None):
         progress = db.get_student_progress(student_id, subject_id)
         return [StudentProgress(**p) for p in progress]
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get progress: {str(e)}")
 
@@ -64,6 +68,8 @@ async def update_student_progress(
         
         return {"message": "Progress updated successfully"}
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update progress: {str(e)}")
 
@@ -81,6 +87,8 @@ async def update_student_language(student_id: int, language_data: UpdateLanguage
         
         return {"message": "Language preference updated successfully"}
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update language: {str(e)}")
 
@@ -136,5 +144,7 @@ async def get_student_dashboard(student_id: int):
                 "subject_progress": [dict(row) for row in subject_progress]
             }
             
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard: {str(e)}") 
\ No newline at end of file
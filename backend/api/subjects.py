@@ -3,39 +3,184 @@ Subjects API endpoints
 Handles curriculum management and LLM content generation
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
-from pydantic import BaseModel
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Dict, Optional, Tuple
 import sys
 from pathlib import Path
 import asyncio
+import concurrent.futures
+import hashlib
+import uuid
 from datetime import datetime
+from itertools import zip_longest
+from functools import lru_cache, partial
+import operator
 import json
+import orjson
+import logging
+import re
+import sqlite3
+from urllib.parse import unquote
 
 # Import from backend core modules
 from backend.core.database import db
+from backend.core.db_pool import get_pooled_conn, immediate_tx
+from backend.core.write_buffer import quiz_result_buffer
+from backend.core.curriculum.llm_client import query_llm, cached_llm, query_llm_stream
+from backend.core.cache import (
+    cache, GEN_STATUS, TOPICS, CHAPTERS, QUIZ_LLM,
+    STATUS_TTL, CONTENT_TTL, LLM_TTL
+)
 from backend.core.curriculum.curriculum_service import (
     generate_topics, generate_chapters, generate_subject_recommendations,
     generate_and_store_topics, generate_and_store_chapters, 
     generate_and_store_chapter_content, get_content_by_language
 )
 from backend.models.curriculum import (
-    Subject, Topic, Chapter, GenerateTopicsRequest, GenerateChaptersRequest,
+    Subject, Topic, GenerateTopicsRequest, GenerateChaptersRequest,
     SetSubjectDifficultyRequest, SubjectDifficultyResponse, DIFFICULTY_LEVELS,
     Quiz, QuizQuestion, QuizSubmission, QuizResult, QuizResultWithDetails
 )
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# orjson encodes the large topic/chapter payloads several times faster than stdlib json;
+# endpoints returning ORJSONResponse directly also skip FastAPI's jsonable_encoder walk
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Long-running LLM generation runs here, off the request threadpool
+_GEN_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="topicgen")
+_inflight: Dict[str, asyncio.Future] = {}  # content_key -> running generation
+MAX_STATUS_WAIT = 30          # Upper bound on a single generation-status long-poll, in seconds
+STATUS_POLL_INTERVAL = 0.5    # Cache re-check interval for generations owned by other workers
+
+# SQL kept as module constants so sqlite3's per-connection statement cache
+# (keyed on the exact SQL text) is hit instead of re-parsing on every call
+_Q_SUBJECT_BY_ID = "SELECT id, name, description FROM subjects WHERE id = ?"
+_Q_SUBJECT_NAMES = "SELECT name FROM subjects"
+_Q_PROGRESS_BATCH = """
+    SELECT chapter FROM student_progress
+    WHERE student_id = ? AND subject_id = ? AND topic = ? AND completed = 1
+    AND chapter IN ({placeholders})
+"""
+
+# Leading ``` / ```json fence and trailing ``` fence around LLM JSON output
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```\s*$')
+
+# Built once: validates a whole question list in a single pydantic-core call
+_QUIZ_QUESTIONS = TypeAdapter(List[QuizQuestion])
+
+# Chapter detail content always holds six pages; one C-level call fetches them all
+_PAGE_KEYS = ('page_1', 'page_2', 'page_3', 'page_4', 'page_5', 'page_6')
+_page_getter = operator.itemgetter(*_PAGE_KEYS)
+
+@lru_cache(maxsize=1024)
+def _subject_row(subject_id: int) -> Dict:
+    """Subject row by id, cached in-process; raises LookupError (never cached) for unknown ids."""
+    with get_pooled_conn() as conn:
+        row = conn.execute(_Q_SUBJECT_BY_ID, (subject_id,)).fetchone()
+    if row is None:
+        raise LookupError(subject_id)
+    return dict(row)
+
+def _get_subject_cached(subject_id: int) -> Optional[Dict]:
+    """Subject row by id or None (shared dict: treat as read-only)."""
+    # Misses aren't cached, so a subject created through another worker is found here too
+    try:
+        return _subject_row(subject_id)
+    except LookupError:
+        return None
+
+@lru_cache(maxsize=2048)
+def _chapter_cached(student_id: int, subject_id: int, topic_title: str, chapter_title: str, difficulty_level: str) -> Dict:
+    """Chapter detail pages, cached in-process; raises LookupError (never cached) when not generated yet."""
+    chapter_data = db.get_chapter_content_from_db(
+        student_id, subject_id, topic_title, chapter_title, difficulty_level
+    )
+    if chapter_data is None:
+        raise LookupError(chapter_title)
+    return chapter_data
+
+@lru_cache(maxsize=4096)
+def _parsed_quiz(quiz_id: str) -> Tuple[List[QuizQuestion], Tuple[int, ...]]:
+    """Validated questions and their correct answers for a quiz (quiz ids are never reused, so never stale)."""
+    quiz = db.get_quiz_by_id(quiz_id)
+    if quiz is None:
+        raise LookupError(quiz_id)
+    questions = _QUIZ_QUESTIONS.validate_json(quiz['questions_json'])
+    return questions, tuple(q.correct_answer for q in questions)
+
+def get_completed_chapters(student_id: int, subject_id: int, topic_title: str, chapter_titles: List[str]) -> set:
+    """Return the subset of chapter titles the student has completed, in one query."""
+    if not chapter_titles:
+        return set()
+    query = _Q_PROGRESS_BATCH.format(placeholders=",".join("?" * len(chapter_titles)))
+    with get_pooled_conn() as conn:
+        rows = conn.execute(query, (student_id, subject_id, topic_title, *chapter_titles)).fetchall()
+    return {row[0] for row in rows}
+
+def merge_bilingual(english_items: List, spanish_items: Optional[List] = None, text_field: str = 'description') -> List[Dict]:
+    """Pair English items (titles kept for URLs) positionally with their Spanish display title and text."""
+    english_items = [item if isinstance(item, dict) else item.model_dump() for item in english_items]
+    if not spanish_items or not isinstance(spanish_items, list):
+        # English-only (the common case): no per-item Spanish lookups
+        return [
+            {"title": en['title'], text_field: en.get(text_field) or '', "display_title": en['title']}
+            for en in english_items
+        ]
+    spanish_items = spanish_items[:len(english_items)]
+    return [
+        {
+            "title": en['title'],  # Always English for URLs
+            text_field: es.get(text_field, en.get(text_field) or '') if es else (en.get(text_field) or ''),
+            "display_title": es.get('title', en['title']) if es else en['title']
+        }
+        for en, es in zip_longest(english_items, spanish_items)
+    ]
+
+def _run_generation(content_key: str, fn, **kwargs):
+    """Run a generation job, clearing the key's status before its waiters are woken."""
+    try:
+        return fn(**kwargs)
+    finally:
+        cache.delete(GEN_STATUS + content_key)
+
+async def _generate_once(content_key: str, fn, **kwargs):
+    """Run a blocking generation off the event loop; concurrent callers for one key share a single run."""
+    future = _inflight.get(content_key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(
+            _GEN_POOL, partial(_run_generation, content_key, fn, **kwargs)
+        )
+        _inflight[content_key] = future
+        future.add_done_callback(lambda _: _inflight.pop(content_key, None))
+    # Shielded so one caller disconnecting doesn't cancel the run for the others
+    return await asyncio.shield(future)
 
-# User-specific generated content storage (no expiration)
-user_generated_content: Dict[str, any] = {
-    "topics": {},  # Format: f"{student_id}_{subject_name}_{difficulty_level}"
-    "chapters": {},  # Format: f"{student_id}_{subject_name}_{topic_title}_{difficulty_level}"
-    "chapter_content": {},  # Format: f"{student_id}_{subject_name}_{topic_title}_{chapter_title}_{difficulty_level}"
-    "chapter_completions": {},  # Format: f"{student_id}_{subject_name}_{topic_title}_{chapter_title}_{difficulty_level}"
-    "chat_history": {},  # Format: f"{student_id}_{subject_name}_{topic_title}_{chapter_title}_{difficulty_level}"
-    "generation_status": {}
-}
+def _stored_chapters(english_chapters, topic_title: str) -> List[Dict]:
+    """Stored chapters as plain title/content dicts; a single stored chapter becomes a one-item list."""
+    # Plain dicts rather than Chapter models: callers only read the fields, and
+    # merge_bilingual would otherwise dump every model straight back to a dict
+    if isinstance(english_chapters, list):
+        return [{'title': chapter['title'], 'content': chapter['content']} for chapter in english_chapters]
+    return [{
+        'title': english_chapters.get('title', topic_title),
+        'content': english_chapters.get('content', 'No content available')
+    }]
+
+def _etag_response(request: Request, content: Dict) -> Response:
+    """JSON response with an ETag; 304 without a body when the client already has this content."""
+    # generated_at is stamped per request, so it's left out of the validator
+    fingerprint = orjson.dumps(
+        {k: v for k, v in content.items() if k != "generated_at"}, option=orjson.OPT_SORT_KEYS
+    )
+    etag = f'"{hashlib.sha256(fingerprint).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(content, headers=headers)
 
 def get_user_content_key(student_id: int, subject_name: str, difficulty_level: str, topic_title: str = None) -> str:
     """Generate user-specific content key."""
@@ -57,6 +202,8 @@ async def get_all_subjects(student_id: int = Query(None, description="Student ID
             subjects = db.get_all_subjects()
         return [Subject(**subject) for subject in subjects]
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get subjects: {str(e)}")
 
@@ -85,6 +232,8 @@ async def set_subject_difficulty(
             "difficulty_level": request.difficulty_level
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to set difficulty: {str(e)}")
 
@@ -112,6 +261,8 @@ async def get_subject_difficulty(
             "is_set": True
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get difficulty: {str(e)}")
 
@@ -131,6 +282,7 @@ async def get_difficulty_levels():
 
 @router.get("/{subject_id}/topics")
 async def get_topics(
+    request: Request,
     subject_id: int, 
     student_id: int = Query(..., description="Student ID for user-specific content"),
     force_regenerate: bool = Query(False, description="Force regenerate content")
@@ -138,12 +290,11 @@ async def get_topics(
     """Get or generate topics for a subject for a specific student."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
+        subject = _get_subject_cached(subject_id)
+        if subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
-        subject_dict = dict(subject)
+        subject_dict = dict(subject)  # Copy: the response adds per-student fields
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -163,15 +314,22 @@ async def get_topics(
         # Check if force regeneration is requested
         if force_regenerate:
             # Clear existing content
-            if content_key in user_generated_content["topics"]:
-                del user_generated_content["topics"][content_key]
-            if content_key in user_generated_content["generation_status"]:
-                del user_generated_content["generation_status"][content_key]
+            cache.delete(TOPICS + content_key, GEN_STATUS + content_key)
         
         # Legacy cache check removed - now using database-first approach with display_title support
         
-        # Check if generation is in progress
-        if content_key in user_generated_content["generation_status"] and user_generated_content["generation_status"][content_key] == "generating":
+        # Generation for this key already running in this process: wait for it and
+        # serve what it stored instead of answering "generating"
+        pending = _inflight.get(content_key)
+        if pending is not None and not force_regenerate:
+            try:
+                await asyncio.shield(pending)
+            except Exception:
+                pass  # The request that started it reports the error; fall through and retry
+        
+        # Check if generation is in progress; claiming the status is atomic across
+        # threads and workers, so only one request can start generating a key
+        if not cache.claim(GEN_STATUS + content_key, "generating", ttl=STATUS_TTL):
             # Add difficulty level to subject object
             subject_dict['difficulty_level'] = difficulty_level
             return {
@@ -182,8 +340,8 @@ async def get_topics(
                 "message": "Topics are being generated. Please check back in a moment."
             }
         
-        # Start generation
-        user_generated_content["generation_status"][content_key] = "generating"
+        # Single timestamp shared by the cache entry and the response
+        generated_at_iso = datetime.now().isoformat(timespec='seconds')
         
         try:
             # Get student language preference
@@ -205,9 +363,6 @@ async def get_topics(
                     language_code='en'
                 )
                 if english_topics:
-                    # Create base topics with English titles
-                    topics_data = []
-                    
                     # If user wants Spanish, get Spanish translations for display
                     spanish_topics = None
                     if language_code == 'es':
@@ -220,46 +375,35 @@ async def get_topics(
                         )
                     
                     # Build topic objects with both English (for URLs) and display titles
-                    for i, topic in enumerate(english_topics):
-                        topic_data = {
-                            "title": topic['title'],  # Always English for URLs
-                            "description": topic.get('description', ''),
-                            "display_title": topic['title']  # Default to English
-                        }
-                        
-                        # Override with Spanish display title if available
-                        if spanish_topics and i < len(spanish_topics):
-                            topic_data["display_title"] = spanish_topics[i]['title']
-                            topic_data["description"] = spanish_topics[i].get('description', topic_data["description"])
-                        
-                        topics_data.append(topic_data)
-                    
+                    topics_data = merge_bilingual(english_topics, spanish_topics)
+
                     # Clear generation status
-                    del user_generated_content["generation_status"][content_key]
+                    cache.delete(GEN_STATUS + content_key)
                     subject_dict['difficulty_level'] = difficulty_level
                     
-                    return {
+                    return _etag_response(request, {
                         "subject": subject_dict,
                         "topics": topics_data,
                         "is_generated": True,
-                        "generated_at": datetime.now().isoformat(),
+                        "generated_at": generated_at_iso,
                         "generating": False,
                         "was_force_regenerated": False,
                         "language": language_code,
                         "content_source": "database_existing"
-                    }
+                    })
             
             # Generate and store topics with automatic translation
-            english_topics = generate_and_store_topics(
+            english_topics = await _generate_once(
+                content_key, generate_and_store_topics,
                 student_id=student_id,
                 subject_id=subject_id,
                 subject_name=subject_dict['name'],
                 difficulty_level=difficulty_level,
-                user_context=user_context
+                user_context=user_context,
+                wait_for_translation=(language_code == 'es')  # Spanish titles are merged below
             )
             
             # Build topic data with both English titles (for URLs) and display titles
-            topics_data = []
             spanish_topics = None
             
             # If user prefers Spanish, try to get translated content
@@ -273,55 +417,44 @@ async def get_topics(
                 )
             
             # Build response with English titles for URLs and display titles for UI
-            for i, topic in enumerate(english_topics):
-                topic_data = {
-                    "title": topic.title,  # Always English for URLs
-                    "description": topic.description or '',
-                    "display_title": topic.title  # Default to English
-                }
-                
-                # Override with Spanish display title if available
-                if spanish_topics and i < len(spanish_topics):
-                    topic_data["display_title"] = spanish_topics[i]['title']
-                    topic_data["description"] = spanish_topics[i].get('description', topic_data["description"])
-                
-                topics_data.append(topic_data)
-            
+            topics_data = merge_bilingual(english_topics, spanish_topics)
+
             # Store in legacy cache for backward compatibility (using English topics)
-            generated_at = datetime.now()
-            user_generated_content["topics"][content_key] = {
+            cache.set(TOPICS + content_key, {
                 "topics": english_topics,
-                "generated_at": generated_at
-            }
+                "generated_at_iso": generated_at_iso
+            }, ttl=CONTENT_TTL)
             
             # Clear generation status
-            del user_generated_content["generation_status"][content_key]
+            cache.delete(GEN_STATUS + content_key)
             
             # Add difficulty level to subject object
             subject_dict['difficulty_level'] = difficulty_level
             
-            return {
+            return _etag_response(request, {
                 "subject": subject_dict,
                 "topics": topics_data,
                 "is_generated": True,
-                "generated_at": generated_at.isoformat(),
+                "generated_at": generated_at_iso,
                 "generating": False,
                 "was_force_regenerated": force_regenerate,
                 "language": language_code,
                 "content_source": "generated_new"
-            }
+            })
             
         except Exception as e:
             # Clear generation status on error
-            if content_key in user_generated_content["generation_status"]:
-                del user_generated_content["generation_status"][content_key]
+            cache.delete(GEN_STATUS + content_key)
             raise e
             
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get topics: {str(e)}")
 
 @router.get("/{subject_id}/topics/{topic_title}/chapters")
 async def get_chapters(
+    request: Request,
     subject_id: int, 
     topic_title: str, 
     student_id: int = Query(..., description="Student ID for user-specific content"),
@@ -330,12 +463,11 @@ async def get_chapters(
     """Get or generate chapters for a topic for a specific student."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
+        subject = _get_subject_cached(subject_id)
+        if subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
-        subject_dict = dict(subject)
+        subject_dict = dict(subject)  # Copy: the response adds per-student fields
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -356,14 +488,12 @@ async def get_chapters(
         # Check if force regeneration is requested
         if force_regenerate:
             # Clear existing content
-            if content_key in user_generated_content["chapters"]:
-                del user_generated_content["chapters"][content_key]
-            if content_key in user_generated_content["generation_status"]:
-                del user_generated_content["generation_status"][content_key]
+            cache.delete(CHAPTERS + content_key, GEN_STATUS + content_key)
         
         # Get student language preference for database lookup
         student = db.get_student_by_id(student_id)
         language_code = student['language_preference'] if student else 'en'
+        generated_at_iso = datetime.now().isoformat(timespec='seconds')
         
         # First priority: Check database for ENGLISH content (always get English titles for URLs)
         if not force_regenerate:
@@ -376,16 +506,10 @@ async def get_chapters(
                 topic_title=topic_title
             )
             if english_chapters:
-                # Handle both list of chapters and single chapter content
-                if isinstance(english_chapters, list):
-                    chapters = [Chapter(title=chapter['title'], content=chapter['content']) 
-                               for chapter in english_chapters]
-                else:
-                    # Single chapter structure - convert to list
-                    chapters = [Chapter(title=english_chapters.get('title', topic_title), 
-                                      content=english_chapters.get('content', 'No content available'))]
+                chapters = _stored_chapters(english_chapters, topic_title)
                 
                 # If user wants Spanish, get translated content for display (but keep English titles for URLs)
+                spanish_chapters = None
                 if language_code == 'es':
                     spanish_chapters = get_content_by_language(
                         student_id=student_id,
@@ -395,66 +519,46 @@ async def get_chapters(
                         language_code='es',
                         topic_title=topic_title
                     )
-                    if spanish_chapters and isinstance(spanish_chapters, list):
-                        # Use Spanish content but keep English titles for URLs
-                        for i, chapter in enumerate(chapters):
-                            if i < len(spanish_chapters):
-                                chapter.content = spanish_chapters[i]['content']
-                
-                # Build chapters with content status
-                chapters_with_content_status = []
-                for i, chapter in enumerate(chapters):
-                    chapter_content_key = get_chapter_content_key(
-                        student_id, subject_dict['name'], difficulty_level, topic_title, chapter.title
-                    )
-                    has_content = chapter_content_key in user_generated_content["chapter_content"]
-                    
-                    # Check completion status from database (fallback to in-memory)
-                    with db.get_connection() as conn:
-                        completion_record = conn.execute("""
-                            SELECT completed FROM student_progress 
-                            WHERE student_id = ? AND subject_id = ? AND topic = ? AND chapter = ?
-                        """, (student_id, subject_id, topic_title, chapter.title)).fetchone()
-                        is_completed_db = bool(completion_record and completion_record[0] == 1)
-                    
-                    # Use database completion status, fallback to in-memory
-                    is_completed = is_completed_db or (chapter_content_key in user_generated_content["chapter_completions"])
-                    
-                    # For Spanish users, get the translated title for display
-                    display_title = chapter.title
-                    if language_code == 'es' and spanish_chapters and isinstance(spanish_chapters, list):
-                        if i < len(spanish_chapters):
-                            display_title = spanish_chapters[i].get('title', chapter.title)
-                    
-                    chapters_with_content_status.append({
-                        "title": chapter.title,  # Always English title for URLs
-                        "display_title": display_title,  # Translated title for display
-                        "content": chapter.content,  # Translated content if available
-                        "has_content_generated": has_content,
-                        "is_completed": is_completed
-                    })
+
+                # English titles for URLs, translated title and content for display
+                chapters_with_content_status = merge_bilingual(chapters, spanish_chapters, text_field='content')
+
+                # Completion status and generated detail content for every chapter, one query each
+                chapter_titles = [chapter['title'] for chapter in chapters]
+                completed_chapters = get_completed_chapters(student_id, subject_id, topic_title, chapter_titles)
+                detailed_chapters = db.get_chapter_titles_with_details(
+                    student_id, subject_id, topic_title, difficulty_level, chapter_titles
+                )
+
+                # Add content status
+                for chapter in chapters_with_content_status:
+                    chapter["has_content_generated"] = chapter['title'] in detailed_chapters
+                    # Based on database completion tracking
+                    chapter["is_completed"] = chapter['title'] in completed_chapters
                 
-                return {
+                return _etag_response(request, {
                     "subject": subject_dict,
                     "topic_title": topic_title,
                     "chapters": chapters_with_content_status,
                     "is_generated": True,
-                    "generated_at": datetime.now().isoformat(),
+                    "generated_at": generated_at_iso,
                     "generating": False,
                     "was_force_regenerated": False,
                     "language": language_code,
                     "content_source": "database_existing"
-                }
+                })
         
         # Generate new chapters and store in database
         try:
             
             # Generate and store chapters with automatic translation
-            chapters = generate_and_store_chapters(
+            chapters = await _generate_once(
+                content_key, generate_and_store_chapters,
                 student_id=student_id,
                 subject_id=subject_id,
                 topic_title=topic_title,
-                difficulty_level=difficulty_level
+                difficulty_level=difficulty_level,
+                wait_for_translation=(language_code == 'es')  # Spanish chapters are merged below
             )
             
             # Get Spanish translations if user prefers Spanish
@@ -468,64 +572,45 @@ async def get_chapters(
                     language_code='es',
                     topic_title=topic_title
                 )
-                if spanish_chapters and isinstance(spanish_chapters, list):
-                    # Update content but keep English titles for URLs
-                    for i, chapter in enumerate(chapters):
-                        if i < len(spanish_chapters):
-                            chapter.content = spanish_chapters[i]['content']
+
+            # English titles for URLs, translated title and content for display
+            chapters_with_content_status = merge_bilingual(chapters, spanish_chapters, text_field='content')
+
+            # Completion status for every chapter in a single query
+            chapter_titles = [chapter.title for chapter in chapters]
+            completed_chapters = get_completed_chapters(student_id, subject_id, topic_title, chapter_titles)
             
-            # Format chapters with content status - check database for chapter detail content
-            chapters_with_content_status = []
-            for i, chapter in enumerate(chapters):
-                # Check if detailed chapter content exists in database
-                chapter_detail_content = get_content_by_language(
-                    student_id=student_id,
-                    subject_id=subject_id,
-                    content_type='chapter_detail',
-                    difficulty_level=difficulty_level,
-                    language_code='en',  # Check English since that's what gets generated first
-                    topic_title=topic_title,
-                    chapter_title=chapter.title
-                )
-                has_content = chapter_detail_content is not None
-                
-                # Check completion status from database
-                with db.get_connection() as conn:
-                    completion_record = conn.execute("""
-                        SELECT completed FROM student_progress 
-                        WHERE student_id = ? AND subject_id = ? AND topic = ? AND chapter = ?
-                    """, (student_id, subject_id, topic_title, chapter.title)).fetchone()
-                    is_completed = bool(completion_record and completion_record[0] == 1)
-                
-                # For Spanish users, get the translated title for display
-                display_title = chapter.title
-                if language_code == 'es' and spanish_chapters and isinstance(spanish_chapters, list):
-                    if i < len(spanish_chapters):
-                        display_title = spanish_chapters[i].get('title', chapter.title)
-                
-                chapters_with_content_status.append({
-                    "title": chapter.title,  # Always English title for URLs
-                    "display_title": display_title,  # Translated title for display
-                    "content": chapter.content,  # Translated content if available
-                    "has_content_generated": has_content,  # Based on database check
-                    "is_completed": is_completed  # Based on database completion tracking
-                })
+            # English detail content (generated first) for every chapter in a single query,
+            # so each chapter below is a set lookup instead of a query plus JSON decode
+            detailed_chapters = db.get_chapter_titles_with_details(
+                student_id, subject_id, topic_title, difficulty_level, chapter_titles
+            )
+
+            # Add content status
+            for chapter in chapters_with_content_status:
+                chapter["has_content_generated"] = chapter['title'] in detailed_chapters
+                # Based on database completion tracking
+                chapter["is_completed"] = chapter['title'] in completed_chapters
             
-            return {
+            return _etag_response(request, {
                 "subject": subject_dict,
                 "topic_title": topic_title,
                 "chapters": chapters_with_content_status,
                 "is_generated": True,
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": generated_at_iso,
                 "generating": False,
                 "was_force_regenerated": force_regenerate,
                 "language": language_code,
                 "content_source": "database_generated"
-            }
+            })
             
+        except HTTPException:
+            raise  # Re-raise HTTP exceptions as-is
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to generate chapters: {str(e)}")
             
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get chapters: {str(e)}")
 
@@ -540,12 +625,11 @@ async def get_chapter_content(
     """Get paginated content for a specific chapter."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
+        subject = _get_subject_cached(subject_id)
+        if subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
-        subject_dict = dict(subject)
+        subject_dict = dict(subject)  # Copy: the response adds per-student fields
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -572,13 +656,12 @@ async def get_chapter_content(
             raise HTTPException(status_code=404, detail="Chapters not found. Please generate chapters first.")
         
         # Verify the requested chapter exists
-        chapter_exists = False
         if isinstance(existing_chapters, list):
-            chapter_exists = any(ch['title'] == chapter_title for ch in existing_chapters)
+            chapter_titles = {ch['title'] for ch in existing_chapters}
         else:
-            chapter_exists = existing_chapters.get('title') == chapter_title
-            
-        if not chapter_exists:
+            chapter_titles = {existing_chapters.get('title')}
+
+        if chapter_title not in chapter_titles:
             raise HTTPException(status_code=404, detail="Chapter not found")
         
         # Get student language preference
@@ -604,7 +687,7 @@ async def get_chapter_content(
         
         if existing_content:
             # Return content from database - use translated chapter title if available
-            pages = [existing_content[f'page_{i}'] for i in range(1, 7)]
+            pages = _page_getter(existing_content)
             # Use translated chapter title if available, otherwise fall back to original
             translated_chapter_title = existing_content.get('chapter_title', chapter_title)
             return {
@@ -622,14 +705,17 @@ async def get_chapter_content(
         # If not in database, generate new content
         
         # Generate and store paginated content with automatic translation
-        paginated_content = generate_and_store_chapter_content(
+        paginated_content = await _generate_once(
+            chapter_content_key, generate_and_store_chapter_content,
             student_id=student_id,
             subject_id=subject_id,
             chapter_title=chapter_title,
             topic_title=topic_title,
             subject_name=subject_dict['name'],
-            difficulty_level=difficulty_level
+            difficulty_level=difficulty_level,
+            wait_for_translation=(language_code == 'es')  # Spanish pages are returned below
         )
+        _chapter_cached.cache_clear()  # New pages must not be shadowed by a stale cached chapter
         
         # If user prefers Spanish, try to get translated content (no English fallback)
         display_chapter_title = chapter_title  # Default to English title
@@ -646,7 +732,7 @@ async def get_chapter_content(
             )
             if translated_content:
                 paginated_content = {
-                    'pages': [translated_content[f'page_{i}'] for i in range(1, 7)],
+                    'pages': _page_getter(translated_content),
                     'summary': translated_content['chapter_summary']
                 }
                 # Use translated chapter title if available
@@ -682,61 +768,31 @@ async def complete_chapter(
     """Mark a chapter as completed by the student."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
+        subject_dict = _get_subject_cached(subject_id)
+        if not subject_dict:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
         if not difficulty_level:
             raise HTTPException(status_code=400, detail="Difficulty level required")
         
-        # Generate completion key
-        chapter_content_key = get_chapter_content_key(
-            student_id, subject_dict['name'], difficulty_level, topic_title, chapter_title
-        )
-        
-        # Mark chapter as completed in memory
-        user_generated_content["chapter_completions"][chapter_content_key] = {
-            "completed_at": datetime.now(),
-            "student_id": student_id,
-            "subject_name": subject_dict['name'],
-            "topic_title": topic_title,
-            "chapter_title": chapter_title,
-            "difficulty_level": difficulty_level
-        }
+        completed_at_iso = datetime.now().isoformat()
         
-        # Persist completion to database
-        with db.get_connection() as conn:
-            # Check if progress record exists
-            existing = conn.execute("""
-                SELECT id FROM student_progress 
-                WHERE student_id = ? AND subject_id = ? AND topic = ? AND chapter = ?
-            """, (student_id, subject_id, topic_title, chapter_title)).fetchone()
-            
-            if existing:
-                # Update existing record
-                conn.execute("""
-                    UPDATE student_progress 
-                    SET completed = 1, created_at = CURRENT_TIMESTAMP
-                    WHERE student_id = ? AND subject_id = ? AND topic = ? AND chapter = ?
-                """, (student_id, subject_id, topic_title, chapter_title))
-            else:
-                # Insert new progress record
-                conn.execute("""
-                    INSERT INTO student_progress (student_id, subject_id, topic, chapter, completed, created_at)
-                    VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
-                """, (student_id, subject_id, topic_title, chapter_title))
-            
-            conn.commit()
+        # Persist completion to database (student_progress is the only completion record)
+        with get_pooled_conn() as conn, immediate_tx(conn):
+            # Single upsert; relies on the unique index over (student, subject, topic, chapter)
+            conn.execute("""
+                INSERT INTO student_progress (student_id, subject_id, topic, chapter, completed, created_at)
+                VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(student_id, subject_id, topic, chapter)
+                DO UPDATE SET completed = 1, created_at = CURRENT_TIMESTAMP
+            """, (student_id, subject_id, topic_title, chapter_title))
         
         return {
             "success": True,
             "message": f"Chapter '{chapter_title}' marked as completed",
-            "completed_at": datetime.now().isoformat()
+            "completed_at": completed_at_iso
         }
         
     except HTTPException:
@@ -752,12 +808,9 @@ async def clear_topics_content(
     """Clear generated topics for a subject for a specific student."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
+        subject_dict = _get_subject_cached(subject_id)
+        if not subject_dict:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -767,13 +820,12 @@ async def clear_topics_content(
         content_key = get_user_content_key(student_id, subject_dict['name'], difficulty_level)
         
         # Clear content
-        if content_key in user_generated_content["topics"]:
-            del user_generated_content["topics"][content_key]
-        if content_key in user_generated_content["generation_status"]:
-            del user_generated_content["generation_status"][content_key]
+        cache.delete(TOPICS + content_key, GEN_STATUS + content_key)
         
         return {"message": "Topics content cleared successfully", "content_key": content_key}
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear content: {str(e)}")
 
@@ -786,12 +838,9 @@ async def clear_chapters_content(
     """Clear generated chapters for a topic for a specific student."""
     try:
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
+        subject_dict = _get_subject_cached(subject_id)
+        if not subject_dict:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
         # Get difficulty level for this student-subject combination
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -801,13 +850,12 @@ async def clear_chapters_content(
         content_key = get_user_content_key(student_id, subject_dict['name'], difficulty_level, topic_title)
         
         # Clear content
-        if content_key in user_generated_content["chapters"]:
-            del user_generated_content["chapters"][content_key]
-        if content_key in user_generated_content["generation_status"]:
-            del user_generated_content["generation_status"][content_key]
+        cache.delete(CHAPTERS + content_key, GEN_STATUS + content_key)
         
         return {"message": "Chapters content cleared successfully", "content_key": content_key}
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear content: {str(e)}")
 
@@ -818,60 +866,82 @@ async def get_user_generated_content(student_id: int):
         # Find all content keys for this student
         student_prefix = f"{student_id}_"
         
-        topics_content = {k: v for k, v in user_generated_content["topics"].items() if k.startswith(student_prefix)}
-        chapters_content = {k: v for k, v in user_generated_content["chapters"].items() if k.startswith(student_prefix)}
+        # Primary-key range scans over this student's keys only; payloads aren't decoded
+        topics_keys = [student_prefix + k for k in cache.scan_keys(TOPICS + student_prefix)]
+        chapters_keys = [student_prefix + k for k in cache.scan_keys(CHAPTERS + student_prefix)]
+        generation_status = cache.scan_prefix(GEN_STATUS + student_prefix)
         
         # Count generation status for this student
-        generating_count = len([k for k, v in user_generated_content["generation_status"].items() 
-                               if k.startswith(student_prefix) and v == "generating"])
+        generating_count = sum(1 for v in generation_status.values() if v == "generating")
         
         return {
             "student_id": student_id,
-            "generated_topics_count": len(topics_content),
-            "generated_chapters_count": len(chapters_content),
+            "generated_topics_count": len(topics_keys),
+            "generated_chapters_count": len(chapters_keys),
             "currently_generating": generating_count,
-            "topics_keys": list(topics_content.keys()),
-            "chapters_keys": list(chapters_content.keys()),
-            "generation_status": {k: v for k, v in user_generated_content["generation_status"].items() 
-                                if k.startswith(student_prefix)}
+            "topics_keys": topics_keys,
+            "chapters_keys": chapters_keys,
+            "generation_status": {student_prefix + k: v for k, v in generation_status.items()}
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user content: {str(e)}")
 
+def _generate_topics_job(content_key: str, subject_name: str, difficulty_level: str):
+    """Background topic generation; records the outcome under the content key's status."""
+    status = "error: generation did not finish"
+    try:
+        topics = generate_topics(subject_name, difficulty_level)
+        # Store the results
+        cache.set(TOPICS + content_key, {
+            "topics": topics,
+            "generated_at_iso": datetime.now().isoformat(timespec='seconds')
+        }, ttl=CONTENT_TTL)
+        status = "completed"
+    except Exception as e:
+        status = f"error: {str(e)}"
+    finally:
+        # Never leave the key stuck at "generating"
+        cache.set(GEN_STATUS + content_key, status, ttl=STATUS_TTL)
+
 @router.post("/generate-topics")
-async def generate_topics_async(request: GenerateTopicsRequest, background_tasks: BackgroundTasks):
+async def generate_topics_async(request: GenerateTopicsRequest):
     """Trigger asynchronous topic generation."""
     # Note: This endpoint would need to be updated to include student_id in the request model
     # For now, keeping it as is for backward compatibility
     content_key = f"{request.subject_name}_{request.difficulty_level}"
     
-    if content_key in user_generated_content["generation_status"] and user_generated_content["generation_status"][content_key] == "generating":
+    # Single-flight: one in-flight generation per key in this process; the cached
+    # status covers generations started by other workers
+    # Claiming the status marks the key as generating atomically
+    if content_key in _inflight or not cache.claim(GEN_STATUS + content_key, "generating", ttl=STATUS_TTL):
         return {"message": "Generation already in progress", "content_key": content_key}
     
-    # Mark as generating
-    user_generated_content["generation_status"][content_key] = "generating"
-    
-    def generate_in_background():
-        try:
-            topics = generate_topics(request.subject_name, request.difficulty_level)
-            # Store the results
-            user_generated_content["topics"][content_key] = {
-                "topics": topics,
-                "generated_at": datetime.now()
-            }
-            user_generated_content["generation_status"][content_key] = "completed"
-        except Exception as e:
-            user_generated_content["generation_status"][content_key] = f"error: {str(e)}"
-    
-    background_tasks.add_task(generate_in_background)
+    future = asyncio.get_running_loop().run_in_executor(
+        _GEN_POOL, _generate_topics_job, content_key, request.subject_name, request.difficulty_level
+    )
+    _inflight[content_key] = future
+    future.add_done_callback(lambda _: _inflight.pop(content_key, None))
     
     return {"message": "Topic generation started", "content_key": content_key}
 
-@router.get("/generation-status/{content_key}")
-async def get_generation_status(content_key: str):
-    """Check the status of content generation."""
-    status = user_generated_content["generation_status"].get(content_key, "not_found")
+@router.on_event("startup")
+def warm_subject_cache():
+    """Load every subject row once so lookups never wait on the database."""
+    for subject in db.get_all_subjects():
+        _subject_row(subject['id'])
+
+@router.on_event("shutdown")
+async def shutdown_generation_pool():
+    """Stop accepting background generation work and flush queued quiz results on shutdown."""
+    _GEN_POOL.shutdown(wait=False)
+    await quiz_result_buffer.close()
+
+def _generation_status_payload(content_key: str) -> Dict:
+    """Current generation status for a content key, as returned to clients."""
+    status = cache.get(GEN_STATUS + content_key, "not_found")
     
     return {
         "content_key": content_key,
@@ -881,6 +951,36 @@ async def get_generation_status(content_key: str):
         "is_error": status.startswith("error:") if isinstance(status, str) else False
     }
 
+@router.get("/generation-status/{content_key}")
+async def get_generation_status(content_key: str):
+    """Check the status of content generation."""
+    return _generation_status_payload(content_key)
+
+@router.get("/generation-status/{content_key}/wait")
+async def wait_generation_status(
+    content_key: str,
+    timeout: float = Query(25, ge=0, description="Seconds to wait for generation to finish")
+):
+    """Long-poll variant: returns as soon as generation finishes, or the current status after timeout."""
+    timeout = min(timeout, MAX_STATUS_WAIT)
+    future = _inflight.get(content_key)
+    if future is not None:
+        # Started in this process: wake up on completion instead of polling
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            # A failed generation still answers the poll; the status payload reports the outcome
+            logger.warning("Generation for %s failed: %s", content_key, e)
+    else:
+        # Started by another worker (or not at all): only the shared status is visible
+        deadline = asyncio.get_running_loop().time() + timeout
+        while (cache.get(GEN_STATUS + content_key) == "generating"
+               and asyncio.get_running_loop().time() < deadline):
+            await asyncio.sleep(STATUS_POLL_INTERVAL)
+    return _generation_status_payload(content_key)
+
 class RecommendSubjectsRequest(BaseModel):
     user_request: str
 
@@ -898,7 +998,7 @@ async def recommend_subjects(
             )
         
         # Generate subject recommendations using AI
-        recommendations = generate_subject_recommendations(request.user_request.strip())
+        recommendations = await asyncio.to_thread(generate_subject_recommendations, request.user_request.strip())
         
         return {
             "user_request": request.user_request.strip(),
@@ -908,6 +1008,8 @@ async def recommend_subjects(
             "generated_at": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
@@ -946,23 +1048,32 @@ async def create_custom_subject(
                 detail="Original request must be at least 5 characters long"
             )
         
-        # Check if subject with same name already exists
-        existing_subjects = db.get_all_subjects()
-        for subject in existing_subjects:
-            if subject['name'].lower() == request.subject_name.strip().lower():
-                raise HTTPException(
-                    status_code=409, 
-                    detail=f"A subject with the name '{request.subject_name.strip()}' already exists"
-                )
+        # Check if subject with same name already exists; compared in Python because
+        # SQLite's LOWER() only folds ASCII
+        wanted = request.subject_name.strip().casefold()
+        with get_pooled_conn() as conn:
+            clash = any(name.casefold() == wanted for (name,) in conn.execute(_Q_SUBJECT_NAMES))
+        if clash:
+            raise HTTPException(
+                status_code=409, 
+                detail=f"A subject with the name '{request.subject_name.strip()}' already exists"
+            )
         
         # Create the custom subject
-        subject_id = db.create_custom_subject(
-            student_id=student_id,
-            name=request.subject_name.strip(),
-            description=request.subject_description.strip(),
-            original_request=request.original_request.strip(),
-            ai_generated_description=request.ai_generated_description.strip() if request.ai_generated_description else None
-        )
+        try:
+            subject_id = db.create_custom_subject(
+                student_id=student_id,
+                name=request.subject_name.strip(),
+                description=request.subject_description.strip(),
+                original_request=request.original_request.strip(),
+                ai_generated_description=request.ai_generated_description.strip() if request.ai_generated_description else None
+            )
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent create of the same name (unique index on LOWER(name))
+            raise HTTPException(
+                status_code=409, 
+                detail=f"A subject with the name '{request.subject_name.strip()}' already exists"
+            )
         
         return {
             "success": True,
@@ -978,76 +1089,59 @@ async def create_custom_subject(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create custom subject: {str(e)}")
 
-@router.post("/{subject_id}/topics/{topic_title}/chapters/{chapter_title}/chat")
-async def chat_with_chapter(
-    subject_id: int,
-    topic_title: str,
-    chapter_title: str,
-    chat_message: ChatMessage,
-    student_id: int = Query(..., description="Student ID for user-specific chat")
-):
-    """Chat with AI tutor about chapter content."""
-    try:
-        # URL decode the parameters
-        from urllib.parse import unquote
-        topic_title = unquote(topic_title)
-        chapter_title = unquote(chapter_title)
-        
-        # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
-
-        # Get difficulty level
-        difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
-        if not difficulty_level:
-            raise HTTPException(status_code=400, detail="Difficulty level required")
-        # Get chapter content from database
-        chapter_data = db.get_chapter_content_from_db(
-            student_id, subject_id, topic_title, chapter_title, difficulty_level
-        )
+def _build_chat_prompt(subject_id: int, topic_title: str, chapter_title: str,
+                       chat_message: ChatMessage, student_id: int):
+    """Validate the chat request and build the tutor prompt; returns (prompt, difficulty_level)."""
+    # Get subject info
+    subject_dict = _get_subject_cached(subject_id)
+    if not subject_dict:
+        raise HTTPException(status_code=404, detail="Subject not found")
 
-        if not chapter_data:
-            raise HTTPException(
-                status_code=404, 
-                detail="Chapter content not found. Please read the chapter first before starting a chat."
-            )
-        
-        # Get student language preference
-        student = db.get_student_by_id(student_id)
-        language_code = student['language_preference'] if student else 'en'
-        
-        # Get chat history from database
-        chat_history = db.get_chat_history(
-            student_id, subject_id, topic_title, chapter_title, difficulty_level
+    # Get difficulty level
+    difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
+    if not difficulty_level:
+        raise HTTPException(status_code=400, detail="Difficulty level required")
+    # Get chapter content from database
+    try:
+        chapter_data = _chapter_cached(student_id, subject_id, topic_title, chapter_title, difficulty_level)
+    except LookupError:
+        raise HTTPException(
+            status_code=404, 
+            detail="Chapter content not found. Please read the chapter first before starting a chat."
         )
-        # Get current page content
-        current_page_content = ""
-        if chat_message.current_page <= len(chapter_data):
-            current_page_content = chapter_data[f'page_{chat_message.current_page}']
-        
-        
-        # Build context with recent chat history for better continuity
-        recent_conversation = ""
-        if chat_history:
-            recent_conversation = "\n".join([
-                f"Student: {msg['user_message']}\nTutor: {msg['assistant_message']}"
-                for msg in chat_history[-3:]  # Last 3 exchanges for context
-            ])
-            recent_conversation = f"\n\nRECENT CONVERSATION:\n{recent_conversation}\n"
-        
-        # Language specific instructions
-        language_instruction = ""
-        if language_code == 'es':
-            language_instruction = "\n\nIMPORTANT: You MUST respond ONLY in Spanish (Español). Do not use any English words or phrases in your response."
-        elif language_code == 'en':
-            language_instruction = "\n\nIMPORTANT: You MUST respond ONLY in English. Do not use any Spanish or other language words or phrases in your response."
-        
-        # Create a simple prompt with context
-        prompt = f"""You are an AI tutor helping a student understand educational content.
+    
+    # Get student language preference
+    student = db.get_student_by_id(student_id)
+    language_code = student['language_preference'] if student else 'en'
+    
+    # Get chat history from database
+    chat_history = db.get_chat_history(
+        student_id, subject_id, topic_title, chapter_title, difficulty_level
+    )
+    # Get current page content
+    current_page_content = ""
+    if chat_message.current_page <= len(chapter_data):
+        current_page_content = chapter_data[f'page_{chat_message.current_page}']
+    
+    
+    # Build context with recent chat history for better continuity
+    recent_conversation = ""
+    if chat_history:
+        recent_conversation = "\n".join([
+            f"Student: {msg['user_message']}\nTutor: {msg['assistant_message']}"
+            for msg in chat_history[-3:]  # Last 3 exchanges for context
+        ])
+        recent_conversation = f"\n\nRECENT CONVERSATION:\n{recent_conversation}\n"
+    
+    # Language specific instructions
+    language_instruction = ""
+    if language_code == 'es':
+        language_instruction = "\n\nIMPORTANT: You MUST respond ONLY in Spanish (Español). Do not use any English words or phrases in your response."
+    elif language_code == 'en':
+        language_instruction = "\n\nIMPORTANT: You MUST respond ONLY in English. Do not use any Spanish or other language words or phrases in your response."
+    
+    # Create a simple prompt with context
+    prompt = f"""You are an AI tutor helping a student understand educational content.
 
 CONTEXT:
 - Subject: {subject_dict['name']}
@@ -1062,10 +1156,29 @@ STUDENT QUESTION: {chat_message.message}
 Please provide a helpful, clear answer that matches the {difficulty_level} difficulty level and references the chapter content when relevant. Keep your response concise but thorough. Reponses should be always less than 100 words.{language_instruction}
 
 TUTOR RESPONSE:"""
+    
+    return prompt, difficulty_level
+
+@router.post("/{subject_id}/topics/{topic_title}/chapters/{chapter_title}/chat")
+async def chat_with_chapter(
+    subject_id: int,
+    topic_title: str,
+    chapter_title: str,
+    chat_message: ChatMessage,
+    student_id: int = Query(..., description="Student ID for user-specific chat")
+):
+    """Chat with AI tutor about chapter content."""
+    try:
+        # URL decode the parameters
+        topic_title = unquote(topic_title)
+        chapter_title = unquote(chapter_title)
         
-        # Get response from LLM
-        from backend.core.curriculum.llm_client import query_llm
-        assistant_response = query_llm(prompt)
+        prompt, difficulty_level = _build_chat_prompt(
+            subject_id, topic_title, chapter_title, chat_message, student_id
+        )
+        
+        # Get response from LLM (off the event loop so other requests keep being served)
+        assistant_response = await asyncio.to_thread(cached_llm, prompt)
         
         # Store the conversation in database
         db.add_chat_message(
@@ -1085,8 +1198,60 @@ TUTOR RESPONSE:"""
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{subject_id}/topics/{topic_title}/chapters/{chapter_title}/chat/stream")
+async def chat_with_chapter_stream(
+    subject_id: int,
+    topic_title: str,
+    chapter_title: str,
+    chat_message: ChatMessage,
+    student_id: int = Query(..., description="Student ID for user-specific chat")
+):
+    """Chat with AI tutor, streaming the response as server-sent events while it is generated."""
+    try:
+        # URL decode the parameters
+        topic_title = unquote(topic_title)
+        chapter_title = unquote(chapter_title)
+        
+        # Validation errors surface as normal HTTP errors before the stream starts
+        prompt, difficulty_level = _build_chat_prompt(
+            subject_id, topic_title, chapter_title, chat_message, student_id
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    
+    def token_gen():
+        chunks = []
+        try:
+            for chunk in query_llm_stream(prompt):
+                chunks.append(chunk)
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+        
+        # Persist the full exchange once, after the stream completes
+        db.add_chat_message(
+            student_id=student_id,
+            subject_id=subject_id,
+            topic_title=topic_title,
+            chapter_title=chapter_title,
+            difficulty_level=difficulty_level,
+            user_message=chat_message.message,
+            assistant_message="".join(chunks).strip(),
+            current_page=chat_message.current_page
+        )
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(token_gen(), media_type="text/event-stream")
 
 @router.get("/{subject_id}/topics/{topic_title}/chapters/{chapter_title}/chat/history")
 async def get_chat_history(
@@ -1098,17 +1263,13 @@ async def get_chat_history(
     """Get chat history for a specific chapter."""
     try:
         # URL decode the parameters
-        from urllib.parse import unquote
         topic_title = unquote(topic_title)
         chapter_title = unquote(chapter_title)
         
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
+        subject_dict = _get_subject_cached(subject_id)
+        if not subject_dict:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
         # Get difficulty level
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -1132,23 +1293,31 @@ async def get_chat_history(
             "message_count": len(chat_history)
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Quiz generation function
 def generate_quiz_questions(subject_name: str, topic_title: str, difficulty_level: str, chapter_contents: List[str]) -> List[QuizQuestion]:
     """Generate 20 quiz questions based on chapter contents using LLM."""
-    from backend.core.curriculum.llm_client import query_llm
-    import uuid
-    import json
-    
-    # Combine all chapter content for context
-    content_context = "\n\n".join(chapter_contents)
+    # Combine chapter content for context, stopping once the prompt budget is filled
+    # (same result as "\n\n".join(chapter_contents)[:8000] without building the full string)
+    budget = 8000
+    parts = []
+    used = 0  # Length of the joined parts plus one trailing separator
+    for content in chapter_contents:
+        if used >= budget + 2:
+            break
+        take = content[:max(budget - used, 0)]
+        parts.append(take)
+        used += len(take) + 2
+    content_context = "\n\n".join(parts)[:budget]
     
     prompt = f"""Generate exactly 10 multiple choice questions for a quiz on the topic "{topic_title}" in the subject "{subject_name}" at {difficulty_level} difficulty level.
 
 CONTENT TO BASE QUESTIONS ON:
-{content_context[:8000]}
+{content_context}
 
 REQUIREMENTS:
 1. Generate exactly 10 questions
@@ -1179,22 +1348,25 @@ IMPORTANT:
 
 Generate the quiz now:"""
 
+    # Identical chapter content yields an identical prompt, so reuse the parsed output
+    cache_key = QUIZ_LLM + hashlib.sha256(
+        f"{subject_name}|{topic_title}|{difficulty_level}|{content_context}".encode()
+    ).hexdigest()
     try:
-        response = query_llm(prompt)
-        
-        # Clean up the response - remove markdown code blocks if present
-        response = response.strip()
-        if response.startswith('```json'):
-            response = response[7:]  # Remove ```json
-        if response.startswith('```'):
-            response = response[3:]   # Remove ```
-        if response.endswith('```'):
-            response = response[:-3]  # Remove trailing ```
-        
-        response = response.strip()
-        
-        # Try to parse JSON response
-        quiz_data = json.loads(response)
+        quiz_data = cache.get(cache_key)
+    except Exception:
+        quiz_data = None  # Cache unavailable: fall through to the LLM
+    
+    response = ""
+    try:
+        if quiz_data is None:
+            response = query_llm(prompt)
+            
+            # Clean up the response - remove markdown code blocks if present
+            response = _FENCE_RE.sub('', response.strip())
+            
+            # Try to parse JSON response
+            quiz_data = json.loads(response)
         
         questions = []
         for i, q in enumerate(quiz_data.get("questions", [])[:10]):  # Ensure max 10 questions
@@ -1209,12 +1381,18 @@ Generate the quiz now:"""
         # Ensure we have exactly 10 questions
         if len(questions) != 10:
             raise ValueError(f"Expected 10 questions, got {len(questions)}")
+        
+        # Only cache output that produced a valid quiz
+        try:
+            cache.set(cache_key, quiz_data, ttl=LLM_TTL)
+        except Exception:
+            pass
             
         return questions
         
     except (json.JSONDecodeError, KeyError, ValueError) as e:
         # Log the raw response for debugging
-        print(f"Failed to parse LLM response. Raw response: {response[:500]}...")
+        logger.warning("Failed to parse LLM quiz response. Raw response: %.500s...", response)
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz questions: {str(e)}")
 
 @router.get("/{subject_id}/topics/{topic_title}/quiz")
@@ -1225,17 +1403,12 @@ async def get_or_generate_quiz(
 ):
     """Get or generate a quiz for a topic."""
     try:
-        from urllib.parse import unquote
-        import json
         topic_title = unquote(topic_title)
         
         # Get subject info
-        with db.get_connection() as conn:
-            subject = conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
-            if not subject:
-                raise HTTPException(status_code=404, detail="Subject not found")
-        
-        subject_dict = dict(subject)
+        subject_dict = _get_subject_cached(subject_id)
+        if not subject_dict:
+            raise HTTPException(status_code=404, detail="Subject not found")
         
         # Get difficulty level
         difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
@@ -1247,8 +1420,7 @@ async def get_or_generate_quiz(
         
         if existing_quiz:
             # Return existing quiz
-            questions_data = json.loads(existing_quiz['questions_json'])
-            questions = [QuizQuestion(**q) for q in questions_data]
+            questions, _ = _parsed_quiz(existing_quiz['id'])
             
             # Get best score if any attempts exist
             best_result = db.get_best_quiz_result(student_id, existing_quiz['id'])
@@ -1278,47 +1450,36 @@ async def get_or_generate_quiz(
         if not english_chapters:
             raise HTTPException(status_code=400, detail="No chapters found. Please generate chapters first.")
         
-        # Handle both list of chapters and single chapter content
-        if isinstance(english_chapters, list):
-            chapters = [Chapter(title=chapter['title'], content=chapter['content']) 
-                       for chapter in english_chapters]
-        else:
-            # Single chapter structure - convert to list
-            chapters = [Chapter(title=english_chapters.get('title', topic_title), 
-                              content=english_chapters.get('content', 'No content available'))]
+        chapters = _stored_chapters(english_chapters, topic_title)
+        
+        # Get all chapter content from database for quiz generation (single query)
+        chapter_details = db.get_chapter_details_bulk(
+            student_id, subject_id, topic_title, difficulty_level,
+            [chapter['title'] for chapter in chapters]
+        )
         
-        # Get all chapter content from database for quiz generation
         chapter_contents = []
         for chapter in chapters:
-            # Get chapter detail content from database
-            chapter_detail_content = get_content_by_language(
-                student_id=student_id,
-                subject_id=subject_id,
-                content_type='chapter_detail',
-                difficulty_level=difficulty_level,
-                language_code='en',
-                topic_title=topic_title,
-                chapter_title=chapter.title
-            )
-            
+            chapter_detail_content = chapter_details.get(chapter['title'])
             if not chapter_detail_content:
                 raise HTTPException(
                     status_code=400, 
-                    detail=f"Chapter '{chapter.title}' content not generated. Please read all chapters first."
+                    detail=f"Chapter '{chapter['title']}' content not generated. Please read all chapters first."
                 )
             
             # Get all page content for this chapter from database
-            pages = [chapter_detail_content[f'page_{i}'] for i in range(1, 7)]
+            pages = _page_getter(chapter_detail_content)
             chapter_full_content = "\n\n".join(pages)
-            chapter_contents.append(f"Chapter: {chapter.title}\n{chapter_full_content}")
+            chapter_contents.append(f"Chapter: {chapter['title']}\n{chapter_full_content}")
         
         # Generate quiz questions
-        questions = generate_quiz_questions(subject_dict['name'], topic_title, difficulty_level, chapter_contents)
+        questions = await asyncio.to_thread(
+            generate_quiz_questions, subject_dict['name'], topic_title, difficulty_level, chapter_contents
+        )
         
         # Store quiz in database
-        import uuid
         quiz_id = str(uuid.uuid4())
-        questions_json = json.dumps([q.dict() for q in questions])
+        questions_json = _QUIZ_QUESTIONS.dump_json(questions).decode()
         
         db.create_quiz(quiz_id, student_id, subject_id, topic_title, difficulty_level, questions_json)
         
@@ -1334,6 +1495,8 @@ async def get_or_generate_quiz(
             "has_attempted": False
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1346,18 +1509,13 @@ async def submit_quiz(
 ):
     """Submit quiz answers and get results."""
     try:
-        from urllib.parse import unquote
-        import uuid
-        import json
-        
         topic_title = unquote(topic_title)
         
-        # Get the quiz
-        difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
+        # Get the quiz (difficulty level and quiz row in one query)
+        difficulty_level, existing_quiz = db.get_quiz_with_difficulty(student_id, subject_id, topic_title)
         if not difficulty_level:
             raise HTTPException(status_code=400, detail="Difficulty level required")
         
-        existing_quiz = db.get_quiz(student_id, subject_id, topic_title, difficulty_level)
         if not existing_quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
         
@@ -1366,17 +1524,13 @@ async def submit_quiz(
             raise HTTPException(status_code=400, detail="Invalid quiz ID")
         
         # Parse questions and calculate score
-        questions_data = json.loads(existing_quiz['questions_json'])
-        questions = [QuizQuestion(**q) for q in questions_data]
+        questions, correct_answers = _parsed_quiz(existing_quiz['id'])
         
         if len(submission.answers) != len(questions):
             raise HTTPException(status_code=400, detail="Number of answers doesn't match number of questions")
         
-        # Calculate score
-        score = 0
-        for i, answer in enumerate(submission.answers):
-            if answer == questions[i].correct_answer:
-                score += 1
+        # Calculate score (element-wise compare runs in C via map/operator.eq)
+        score = sum(map(operator.eq, submission.answers, correct_answers))
         
         percentage = (score / len(questions)) * 100
         
@@ -1384,11 +1538,12 @@ async def submit_quiz(
         result_id = str(uuid.uuid4())
         answers_json = json.dumps(submission.answers)
         
-        db.save_quiz_result(result_id, submission.quiz_id, student_id, answers_json, score, percentage)
+        # Concurrent submissions are committed together in one batched transaction
+        await quiz_result_buffer.write((result_id, submission.quiz_id, student_id, answers_json, score, percentage))
         
-        # Get all results to determine if this is the best score
-        all_results = db.get_quiz_results(student_id, submission.quiz_id)
-        is_best_score = score >= max([r['score'] for r in all_results])
+        # Best score so far (includes this attempt) decides whether this is a new best;
+        # a perfect score can't be beaten, so it skips the lookup
+        is_best_score = score == len(questions) or score >= db.get_max_quiz_score(student_id, submission.quiz_id)
         
         return QuizResultWithDetails(
             id=result_id,
@@ -1402,6 +1557,8 @@ async def submit_quiz(
             is_best_score=is_best_score
         )
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1409,22 +1566,20 @@ async def submit_quiz(
 async def get_quiz_results_history(
     subject_id: int,
     topic_title: str,
-    student_id: int = Query(..., description="Student ID for user-specific quiz results")
+    student_id: int = Query(..., description="Student ID for user-specific quiz results"),
+    summary_only: bool = Query(False, description="Return only attempt count and best score"),
+    page: int = Query(1, ge=1, description="History page number (1-based)"),
+    page_size: Optional[int] = Query(None, ge=1, description="Results per page (all when omitted)")
 ):
     """Get quiz results history for a student."""
     try:
-        from urllib.parse import unquote
-        import json
-        
         topic_title = unquote(topic_title)
         
-        # Get difficulty level
-        difficulty_level = db.get_student_subject_difficulty(student_id, subject_id)
+        # Get difficulty level and quiz in one query
+        difficulty_level, existing_quiz = db.get_quiz_with_difficulty(student_id, subject_id, topic_title)
         if not difficulty_level:
             raise HTTPException(status_code=400, detail="Difficulty level required")
         
-        # Get quiz
-        existing_quiz = db.get_quiz(student_id, subject_id, topic_title, difficulty_level)
         if not existing_quiz:
             # Return empty results if no quiz exists yet
             return {
@@ -1436,27 +1591,47 @@ async def get_quiz_results_history(
                 "results_history": []
             }
         
-        # Get all results
-        results = db.get_quiz_results(student_id, existing_quiz['id'])
-        best_result = db.get_best_quiz_result(student_id, existing_quiz['id'])
+        if summary_only:
+            # Counts only: one aggregate query, no history rows transferred
+            summary = db.get_quiz_results_summary(student_id, existing_quiz['id'])
+            return {
+                "quiz_id": existing_quiz['id'],
+                "topic_title": topic_title,
+                **summary
+            }
+        
+        # Results with their best-score flag in one query (one page if page_size is given)
+        offset = (page - 1) * page_size if page_size else 0
+        results = db.get_quiz_results_with_best(student_id, existing_quiz['id'], limit=page_size, offset=offset)
+        
+        if page_size:
+            # A page doesn't hold every attempt, so the totals come from the aggregate query
+            summary = db.get_quiz_results_summary(student_id, existing_quiz['id'])
+        else:
+            best_result = next((r for r in results if r['is_best']), None)
+            summary = {
+                "total_attempts": len(results),
+                "best_score": best_result['score'] if best_result else None,
+                "best_percentage": best_result['percentage'] if best_result else None
+            }
         
         return {
             "quiz_id": existing_quiz['id'],
             "topic_title": topic_title,
-            "total_attempts": len(results),
-            "best_score": best_result['score'] if best_result else None,
-            "best_percentage": best_result['percentage'] if best_result else None,
+            **summary,
             "results_history": [
                 {
                     "id": r['id'],
                     "score": r['score'],
                     "percentage": r['percentage'],
                     "submitted_at": r['submitted_at'],
-                    "is_best": r['score'] == best_result['score'] if best_result else False
+                    "is_best": bool(r['is_best'])
                 }
                 for r in results
             ]
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
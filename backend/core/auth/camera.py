@@ -1,29 +1,71 @@
+import os
+import sys
+
 import cv2
 
+MAX_CAMERA_INDEX = 10  # Indices 0..9 at most are probed
+
+# Naming the platform's capture backend skips OpenCV's probe of every other backend on open;
+# cameras it can't open (e.g. GStreamer/CSI devices) fall back to OpenCV's default choice
+if sys.platform == "win32":
+    CAPTURE_API = cv2.CAP_DSHOW
+elif sys.platform.startswith("linux"):
+    CAPTURE_API = cv2.CAP_V4L2
+else:
+    CAPTURE_API = cv2.CAP_ANY
+
+# Requested capture size; smaller frames are cheaper to convert, but faces must stay above
+# the detector's 100px minimum. Set either to 0 to keep the driver's default size.
+FRAME_WIDTH = int(os.getenv("CAMERA_FRAME_WIDTH", "640"))
+FRAME_HEIGHT = int(os.getenv("CAMERA_FRAME_HEIGHT", "480"))
+FRAME_FPS = 15
+
+def _open_capture(index: int) -> cv2.VideoCapture:
+    """Open a camera with the platform backend, falling back to OpenCV's default backend."""
+    cap = cv2.VideoCapture(index, CAPTURE_API)
+    if not cap.isOpened() and CAPTURE_API != cv2.CAP_ANY:
+        cap.release()
+        cap = cv2.VideoCapture(index)
+    return cap
+
+def _probe_camera(index: int) -> bool:
+    """Check whether a camera index delivers frames (grab() skips decoding the frame)."""
+    cap = _open_capture(index)
+    try:
+        return cap.isOpened() and cap.grab()
+    finally:
+        cap.release()
+
 def get_available_cameras():
     """Get a list of available camera indices."""
-    index = 0
+    # Probed one at a time up to the first gap, so only a single missing device
+    # (and its driver timeout) is ever touched
     arr = []
-    while True:
-        cap = cv2.VideoCapture(index)
-        if not cap.read()[0]:
+    for index in range(MAX_CAMERA_INDEX):
+        if not _probe_camera(index):
             break
-        else:
-            arr.append(index)
-        cap.release()
-        index += 1
+        arr.append(index)
     return arr
 
 def open_camera(camera_index: int = 0):
-    cap = cv2.VideoCapture(camera_index)
+    cap = _open_capture(camera_index)
     if not cap.isOpened():
         raise RuntimeError("Could not open webcam")
+    if FRAME_WIDTH and FRAME_HEIGHT:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, FRAME_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Keep at most one queued frame so reads aren't stale
     return cap
 
 
 def capture_frame(cap: cv2.VideoCapture):
     """Capture a single frame from an opened webcam."""
-    ret, frame = cap.read()
+    # Skip whatever the driver has queued with cheap grab() calls and decode only the
+    # newest frame; drivers that don't report a buffer size get a single grab
+    for _ in range(max(int(cap.get(cv2.CAP_PROP_BUFFERSIZE)), 1)):
+        cap.grab()
+    ret, frame = cap.retrieve()
     if not ret:
         raise RuntimeError("Failed to read frame from webcam")
     return frame
@@ -1,27 +1,55 @@
 
+import threading
+from functools import lru_cache
+
 from backend.core.auth.face_db import save_encoding, load_all_encodings
 from backend.core.auth.face_detector import FaceDetector
 import numpy as np
-from skimage.metrics import structural_similarity as ssim
 
 # Stricter tolerance for better security
 _DEF_TOLERANCE = 0.85  # Adjusted for HOG embeddings
 _DUPLICATE_THRESHOLD = 0.95  # Adjusted for HOG embeddings
 
-def _calculate_similarity(emb1, emb2):
-    """Calculate similarity between two HOG embeddings."""
-    # Using cosine similarity, where higher is better
-    return np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+# OpenCV cascade/HOG objects aren't documented as thread-safe, so requests share one under a lock
+_detector_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _detector() -> FaceDetector:
+    """Process-wide face detector; the Haar cascade XML is loaded once instead of per request."""
+    return FaceDetector()
+
+def _detect_single_face_embedding(frame):
+    """Detect exactly one face in frame and return its embedding (RuntimeError otherwise)."""
+    detector = _detector()
+    with _detector_lock:
+        faces = detector.detect_faces(frame)
+        
+        if len(faces) == 0:
+            raise RuntimeError("No face detected. Please ensure your face is clearly visible.")
+        if len(faces) > 1:
+            raise RuntimeError("Multiple faces detected. Only one person at a time.")
+        
+        embedding = detector.extract_face_embedding(frame, faces)
+    if embedding is None:
+        raise RuntimeError("Could not extract face features. Please try again.")
+    return embedding
+
+def _calculate_similarity(embedding, known_encodings):
+    """Calculate similarity between a HOG embedding and every row of the (unit-length) stored encodings."""
+    # Using cosine similarity, where higher is better; stored encodings are already
+    # normalized, so only the probe needs a norm and one matrix-vector product does the rest
+    embedding = np.asarray(embedding, dtype=np.float32)
+    return np.atleast_2d(known_encodings) @ (embedding / np.linalg.norm(embedding))
 
 def _check_for_duplicate_face(new_encoding, existing_names, existing_encodings):
     """Check if this face is already registered. Returns (is_duplicate, existing_name)."""
     if existing_encodings.size == 0:
         return False, None
     
-    for i, existing_encoding in enumerate(existing_encodings):
-        similarity = _calculate_similarity(new_encoding, existing_encoding)
-        if similarity > _DUPLICATE_THRESHOLD:
-            return True, existing_names[i]
+    similarities = _calculate_similarity(new_encoding, existing_encodings)
+    best_match_idx = int(np.argmax(similarities))
+    if similarities[best_match_idx] > _DUPLICATE_THRESHOLD:
+        return True, existing_names[best_match_idx]
     
     return False, None
 
@@ -32,18 +60,8 @@ def register_face(name: str, frame) -> None:
     if name in existing_names:
         raise RuntimeError(f"Student '{name}' is already registered.")
     
-    detector = FaceDetector()
     try:
-        faces = detector.detect_faces(frame)
-        
-        if len(faces) == 0:
-            raise RuntimeError("No face detected. Please ensure your face is clearly visible.")
-        if len(faces) > 1:
-            raise RuntimeError("Multiple faces detected. Only one person at a time.")
-            
-        new_encoding = detector.extract_face_embedding(frame, faces)
-        if new_encoding is None:
-            raise RuntimeError("Could not extract face features. Please try again.")
+        new_encoding = _detect_single_face_embedding(frame)
 
         is_duplicate, existing_name = _check_for_duplicate_face(new_encoding, existing_names, existing_encodings)
         if is_duplicate:
@@ -61,26 +79,16 @@ def authenticate(frame, tolerance: float = _DEF_TOLERANCE) -> str:
     if not names:
         raise RuntimeError("No registered students found. Please register first.")
 
-    detector = FaceDetector()
     try:
-        faces = detector.detect_faces(frame)
+        unknown_encoding = _detect_single_face_embedding(frame)
         
-        if len(faces) == 0:
-            raise RuntimeError("No face detected. Please ensure your face is clearly visible.")
-        if len(faces) > 1:
-            raise RuntimeError("Multiple faces detected. Only one person at a time.")
-
-        unknown_encoding = detector.extract_face_embedding(frame, faces)
-        if unknown_encoding is None:
-            raise RuntimeError("Could not extract face features. Please try again.")
-        
-        similarities = [_calculate_similarity(unknown_encoding, known) for known in known_encodings]
-        
-        if not similarities:
+        if known_encodings.size == 0:
             raise RuntimeError("Authentication failed. No known faces to compare against.")
+        
+        similarities = _calculate_similarity(unknown_encoding, known_encodings)
 
-        max_similarity = np.max(similarities)
-        best_match_idx = np.argmax(similarities)
+        best_match_idx = int(np.argmax(similarities))
+        max_similarity = similarities[best_match_idx]
         
         if max_similarity >= tolerance:
             authenticated_name = names[best_match_idx]
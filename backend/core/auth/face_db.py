@@ -4,17 +4,32 @@ from pathlib import Path
 EMBED_DIR = Path("backend/face_embeddings")
 EMBED_DIR.mkdir(exist_ok=True)
 
+# Loaded encodings, reused until the embeddings directory changes
+_loaded = {"mtime": None, "names": [], "encodings": np.array([])}
+
+def _normalize_rows(encodings: np.ndarray) -> np.ndarray:
+    """Scale each encoding to unit length so cosine similarity is a plain dot product."""
+    encodings = np.asarray(encodings, dtype=np.float32)
+    return encodings / np.linalg.norm(encodings, axis=-1, keepdims=True)
+
 def save_encoding(name: str, encoding: np.ndarray):
-    """Save a face encoding as a .npy file under the given name."""
-    np.save(EMBED_DIR / f"{name}.npy", encoding)
+    """Save a face encoding (L2-normalized) as a .npy file under the given name."""
+    np.save(EMBED_DIR / f"{name}.npy", _normalize_rows(encoding))
+    _loaded["mtime"] = None
 
 def load_all_encodings():
-    """Return list of names and stacked encodings array."""
-    names = []
-    encodings = []
-    for file in EMBED_DIR.glob("*.npy"):
-        names.append(file.stem)
-        encodings.append(np.load(file))
-    if encodings:
-        return names, np.vstack(encodings)
-    return names, np.array([])
\ No newline at end of file
+    """Return list of names and stacked, L2-normalized encodings array."""
+    mtime = EMBED_DIR.stat().st_mtime_ns
+    if _loaded["mtime"] != mtime:
+        names = []
+        encodings = []
+        for file in EMBED_DIR.glob("*.npy"):
+            names.append(file.stem)
+            encodings.append(np.load(file))
+        # Files saved before encodings were normalized are scaled here; already-unit rows are unchanged
+        _loaded.update(
+            mtime=mtime,
+            names=names,
+            encodings=_normalize_rows(np.vstack(encodings)) if encodings else np.array([]),
+        )
+    return list(_loaded["names"]), _loaded["encodings"]
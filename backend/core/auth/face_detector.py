@@ -8,6 +8,14 @@ class FaceDetector:
         # Use a pre-trained Haar Cascade model for face detection
         model_path = Path(cv2.data.haarcascades) / "haarcascade_frontalface_default.xml"
         self.face_cascade = cv2.CascadeClassifier(str(model_path))
+        
+        # HOG parameters compatible with the 96x96 face crops; the descriptor is built once per detector
+        win_size = (96, 96)
+        block_size = (16, 16)
+        block_stride = (8, 8)
+        cell_size = (8, 8)
+        nbins = 9
+        self.hog = cv2.HOGDescriptor(win_size, block_size, block_stride, cell_size, nbins)
 
     def detect_faces(self, frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
@@ -32,14 +40,6 @@ class FaceDetector:
         # Resize to a dimension compatible with HOG parameters
         resized_face = cv2.resize(gray_face, (96, 96))
         
-        # Define HOG parameters compatible with the 96x96 image size
-        win_size = (96, 96)
-        block_size = (16, 16)
-        block_stride = (8, 8)
-        cell_size = (8, 8)
-        nbins = 9
-        
-        hog = cv2.HOGDescriptor(win_size, block_size, block_stride, cell_size, nbins)
-        embedding = hog.compute(resized_face)
+        embedding = self.hog.compute(resized_face)
         
         return embedding.flatten()
@@ -0,0 +1,136 @@
+"""
+Shared key-value cache for the AI Tutor application
+Persistent, TTL-aware store for generation status and generated content markers,
+visible to every uvicorn worker and kept across restarts
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from backend.core.database import ROOT_DIR
+
+CACHE_PATH = ROOT_DIR / "data" / "cache.db"
+CACHE_PATH.parent.mkdir(exist_ok=True)
+
+# Key namespaces (bump the version to invalidate a namespace after a format change)
+GEN_STATUS = "genstat:v1:"
+TOPICS = "topics:v1:"
+CHAPTERS = "chapters:v1:"
+QUIZ_LLM = "quiz_llm:v1:"
+LLM_RESPONSE = "llm:v1:"
+TRANSLATION = "translate:v1:"
+
+STATUS_TTL = 3600      # A crashed worker's "generating" marker clears itself after an hour
+CONTENT_TTL = 86400    # Cached topics/chapters payloads
+LLM_TTL = 86400 * 30   # Parsed LLM output keyed by a hash of its inputs
+LLM_RESPONSE_TTL = 86400 * 7  # Raw LLM responses keyed by a hash of the prompt
+PURGE_EVERY = 1000     # Writes between sweeps of expired entries
+
+def _json_default(value: Any):
+    """Serialize pydantic models stored in cache values (orjson handles datetimes natively)."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _dumps(value: Any) -> str:
+    return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+class Cache:
+    """SQLite-backed key-value store with per-key expiry and prefix scans."""
+
+    def __init__(self, path: str = None):
+        self.path = path or str(CACHE_PATH)
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL
+                ) WITHOUT ROWID
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets workers read while another writes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for key, or default if missing or expired."""
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return orjson.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Store value under key, expiring after ttl seconds (never if None)."""
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, _dumps(value), expires_at)
+        )
+        # Expired rows are skipped by reads but not removed; sweep them now and then
+        # so the table stays bounded by live entries between restarts
+        if next(self._writes) % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def claim(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Atomically set key to value unless it already holds that live value; True if this call set it."""
+        encoded = _dumps(value)
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        return self._conn().execute("""
+            INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE cache.value != excluded.value OR (cache.expires_at IS NOT NULL AND cache.expires_at <= ?)
+        """, (key, encoded, expires_at, now)).rowcount == 1
+
+    def delete(self, *keys: str):
+        """Remove keys; missing keys are ignored."""
+        self._conn().executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def exists(self, key: str) -> bool:
+        """Check whether a live entry exists for key."""
+        return self._conn().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone() is not None
+
+    def scan_prefix(self, prefix: str) -> Dict[str, Any]:
+        """Return live entries whose key starts with prefix, with the prefix stripped."""
+        # Range scan on the primary key instead of LIKE, which can't use the index for arbitrary text
+        rows = self._conn().execute(
+            "SELECT key, value FROM cache WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\U0010ffff", time.time())
+        ).fetchall()
+        return {key[len(prefix):]: orjson.loads(value) for key, value in rows}
+
+    def scan_keys(self, prefix: str) -> List[str]:
+        """Like scan_prefix, but returns only the stripped keys without decoding values."""
+        rows = self._conn().execute(
+            "SELECT key FROM cache WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\U0010ffff", time.time())
+        ).fetchall()
+        return [row[0][len(prefix):] for row in rows]
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns the number removed."""
+        return self._conn().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+
+# Global cache instance
+cache = Cache()
@@ -1,7 +1,7 @@
 
 # app/curriculum/curriculum_service.py
 
-from .llm_client import query_llm
+from .llm_client import query_llm, cached_llm, forget_cached_llm, normalize_cache_key
 from .prompts import get_topics_prompt, get_chapters_prompt, get_subject_recommendations_prompt
 import sys
 from pathlib import Path
@@ -10,57 +10,119 @@ from models.curriculum import Topic, Chapter
 from ..database import db
 from .translation_service import translation_service
 import json
+import operator
 import re
-import uuid
 import logging
-from typing import List, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Dict, Optional, Tuple
+import orjson
 from fastapi import HTTPException
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Patterns compiled once; they run on every topic, chapter and page the LLM returns
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_HEADER_RE = re.compile(r'^#+\s*', re.MULTILINE)
+_LIST_MARKER_RE = re.compile(r'^[\d\.\)\-\*]+\s*', re.MULTILINE)
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n')
+_LINE_EDGE_SPACE_RE = re.compile(r'^\s+|\s+$', re.MULTILINE)
+_NUMBERED_ITEM_RE = re.compile(r"\d+\.\s*(.*)")
+_BOLD_TITLE_RE = re.compile(r'\*\*(.*?)\*\*(.*)')
+
+# Stored chapter detail layout; translation, chat and the chapter endpoints read
+# these keys from the same rows, so the shape stays flat
+_PAGE_KEYS = ('page_1', 'page_2', 'page_3', 'page_4', 'page_5', 'page_6')
+_page_getter = operator.itemgetter(*_PAGE_KEYS)
+
+# Spanish translation is a second LLM round trip; it runs here instead of on the request path
+_TRANSLATION_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translate")
+
+def _log_translation(content_id: str, future: Future):
+    """Done-callback for a background translation; errors are logged, never raised."""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Spanish translation failed for {content_id}: {str(error)}")
+    else:
+        logger.info(f"Spanish translation completed for {content_id}")
+
+def _translate_content(content_id: str, wait: bool):
+    """Queue and start the Spanish translation of content_id; block until it finishes only if wait."""
+    translation_service.queue_translation(content_id, 'es')
+    future = _TRANSLATION_POOL.submit(translation_service.translate_content, content_id, 'es')
+    future.add_done_callback(partial(_log_translation, content_id))
+    if wait:
+        future.exception()  # Wait for completion; the callback has already logged any error
+
 def _clean_markdown_text(text: str) -> str:
     """Clean up markdown formatting from text."""
     if not text:
         return ""
     
+    # Quick check: a single plain line (most titles and descriptions) that doesn't
+    # open with a list-marker character has nothing for any pass below to remove
+    if '\n' not in text and '*' not in text and '#' not in text and not (text[0] in '.)-' or text[0].isdecimal()):
+        return text.strip()
+    
+    # Each pass only runs when its marker character is present at all; the
+    # substring checks are single C scans, far cheaper than a regex pass
+    # over text (mostly plain titles) that can't match
+    
     # Remove extra markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove bold formatting
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Remove italic formatting
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)  # Remove header marks
-    text = re.sub(r'^[\d\.\)\-\*]+\s*', '', text, flags=re.MULTILINE)  # Remove list markers
-    
-    # Clean up extra whitespace
-    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)  # Remove excessive line breaks
-    text = re.sub(r'^\s+|\s+$', '', text, flags=re.MULTILINE)  # Remove leading/trailing spaces
+    if '*' in text:
+        text = _BOLD_RE.sub(r'\1', text)     # Remove bold formatting
+        text = _ITALIC_RE.sub(r'\1', text)   # Remove italic formatting
+    if '#' in text:
+        text = _HEADER_RE.sub('', text)      # Remove header marks
+    text = _LIST_MARKER_RE.sub('', text)     # Remove list markers
+    
+    # Clean up extra whitespace (single-line text only needs the final strip)
+    if '\n' in text:
+        text = _EXTRA_BLANK_LINES_RE.sub('\n\n', text)  # Remove excessive line breaks
+        text = _LINE_EDGE_SPACE_RE.sub('', text)         # Remove leading/trailing spaces
     text = text.strip()
     
     return text
 
-def _extract_json_from_response(response: str) -> str:
-    """Extract JSON content from LLM response, handling cases where extra text is included."""
-    # Look for JSON array pattern
-    json_match = re.search(r'\[\s*\{.*?\}\s*\]', response, re.DOTALL)
-    if json_match:
-        return json_match.group(0)
-    
-    # Fallback: try to find the content between first [ and last ]
-    start_idx = response.find('[')
-    end_idx = response.rfind(']')
-    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-        return response[start_idx:end_idx + 1]
-    
-    # If no JSON found, return original response
-    return response
+_json_decoder = json.JSONDecoder()
+
+def _has_expected_shape(value, opener: str) -> bool:
+    """An array must hold objects and an object must be a dict; bracketed prose like [1] fails."""
+    if opener == '[':
+        return isinstance(value, list) and any(isinstance(item, dict) for item in value)
+    return isinstance(value, dict)
 
-def _parse_topics_response(response: str) -> List[Topic]:
-    """Parse LLM response into Topic objects."""
+def _decode_json_from_response(response: str, opener: str = '['):
+    """Decode the first JSON value starting with opener, ignoring any text the LLM put around it."""
+    # raw_decode parses in place from an offset and stops at the end of the value,
+    # so there is no regex pre-scan and no substring copy; a stray bracket in
+    # leading prose (or a value of the wrong shape, e.g. a "[1]" citation) just
+    # moves the search on to the next one
+    first = None
+    start = response.find(opener)
+    while start != -1:
+        try:
+            value = _json_decoder.raw_decode(response, start)[0]
+        except json.JSONDecodeError:
+            start = response.find(opener, start + 1)
+            continue
+        if _has_expected_shape(value, opener):
+            return value
+        if first is None:
+            first = value
+        start = response.find(opener, start + 1)
+    if first is not None:
+        # Nothing better anywhere; let the caller judge e.g. an empty array
+        return first
+    raise ValueError(f"No JSON value starting with {opener!r} in LLM response")
+
+def _parse_topics_response(response: str) -> Tuple[List[Topic], bool]:
+    """Parse LLM response into Topic objects; the flag is False when the legacy list parser was needed."""
     try:
-        # Extract JSON from response
-        json_content = _extract_json_from_response(response)
-        
-        # Parse JSON
-        topics_data = json.loads(json_content)
+        # Parse the JSON array out of the response
+        topics_data = _decode_json_from_response(response)
         
         if not isinstance(topics_data, list):
             raise ValueError("Expected JSON array of topics")
@@ -74,21 +136,18 @@ def _parse_topics_response(response: str) -> List[Topic]:
                 if title:  # Only add if title is not empty
                     topics.append(Topic(title=title, description=description))
         
-        return topics
+        return topics, True
         
     except (json.JSONDecodeError, ValueError, KeyError) as e:
         # Fallback to legacy parsing if JSON parsing fails
-        print(f"JSON parsing failed: {e}. Falling back to legacy parsing.")
-        return _fallback_parse_list_to_topics(response)
+        logger.warning("JSON parsing failed: %s. Falling back to legacy parsing.", e)
+        return _fallback_parse_list_to_topics(response), False
 
-def _parse_chapters_response(response: str) -> List[Chapter]:
-    """Parse LLM response into Chapter objects."""
+def _parse_chapters_response(response: str) -> Tuple[List[Chapter], bool]:
+    """Parse LLM response into Chapter objects; the flag is False when the legacy list parser was needed."""
     try:
-        # Extract JSON from response
-        json_content = _extract_json_from_response(response)
-        
-        # Parse JSON
-        chapters_data = json.loads(json_content)
+        # Parse the JSON array out of the response
+        chapters_data = _decode_json_from_response(response)
         
         if not isinstance(chapters_data, list):
             raise ValueError("Expected JSON array of chapters")
@@ -102,23 +161,24 @@ def _parse_chapters_response(response: str) -> List[Chapter]:
                 if title:  # Only add if title is not empty
                     chapters.append(Chapter(title=title, content=content))
         
-        return chapters
+        return chapters, True
         
     except (json.JSONDecodeError, ValueError, KeyError) as e:
         # Fallback to legacy parsing if JSON parsing fails
-        print(f"JSON parsing failed: {e}. Falling back to legacy parsing.")
-        return _fallback_parse_list_to_chapters(response)
+        logger.warning("JSON parsing failed: %s. Falling back to legacy parsing.", e)
+        return _fallback_parse_list_to_chapters(response), False
 
 def _fallback_parse_list_to_topics(text: str) -> List[Topic]:
     """Fallback parser for numbered list format to Topic objects."""
-    items = [item.strip() for item in re.findall(r"\d+\.\s*(.*)", text)]
     topics = []
     
-    for item in items:
+    # Walk the matches lazily instead of materializing a list of every item first
+    for item_match in _NUMBERED_ITEM_RE.finditer(text):
+        item = item_match.group(1).strip()
         if item:
             # Try to split title and description
             if '**' in item:
-                match = re.match(r'\*\*(.*?)\*\*(.*)', item)
+                match = _BOLD_TITLE_RE.match(item)
                 if match:
                     title = _clean_markdown_text(match.group(1))
                     description = _clean_markdown_text(match.group(2))
@@ -136,14 +196,15 @@ def _fallback_parse_list_to_topics(text: str) -> List[Topic]:
 
 def _fallback_parse_list_to_chapters(text: str) -> List[Chapter]:
     """Fallback parser for numbered list format to Chapter objects."""
-    items = [item.strip() for item in re.findall(r"\d+\.\s*(.*)", text)]
     chapters = []
     
-    for item in items:
+    # Walk the matches lazily instead of materializing a list of every item first
+    for item_match in _NUMBERED_ITEM_RE.finditer(text):
+        item = item_match.group(1).strip()
         if item:
             # Try to extract title and use full item as content
             if '**' in item:
-                match = re.match(r'\*\*(.*?)\*\*(.*)', item)
+                match = _BOLD_TITLE_RE.match(item)
                 if match:
                     title = _clean_markdown_text(match.group(1))
                     content = _clean_markdown_text(item)
@@ -162,27 +223,46 @@ def _fallback_parse_list_to_chapters(text: str) -> List[Chapter]:
 def generate_topics(subject: str, level: str, user_context: str = None) -> List[Topic]:
     """Generates a list of Topic objects for a given subject and level, optionally considering user context."""
     prompt = get_topics_prompt(subject, level, user_context)
-    response = query_llm(prompt)
-    return _parse_topics_response(response)
+    # Shared across students: the prompt depends only on these inputs, so
+    # "Algebra"/"algebra " at the same level reuse one LLM response
+    cache_key = normalize_cache_key("topics", subject, level, user_context)
+    response = cached_llm(prompt, cache_key=cache_key)
+    topics, parsed_json = _parse_topics_response(response)
+    if not (parsed_json and topics):
+        # A fallback or empty parse must not be replayed to every later student; ask the LLM again next time
+        forget_cached_llm(prompt, cache_key=cache_key)
+    return topics
 
-def generate_and_store_topics(student_id: int, subject_id: int, subject_name: str, 
-                             difficulty_level: str, user_context: str = None) -> List[Topic]:
-    """Generate topics and store them persistently with automatic translation."""
-    logger.info(f"Generating topics for student {student_id}, subject {subject_id}")
-    
-    # Check if topics already exist
-    content_id = f"topics_{student_id}_{subject_id}_{difficulty_level}"
+@lru_cache(maxsize=256)
+def _stored_topic_models(student_id: int, subject_id: int, difficulty_level: str) -> Tuple[Topic, ...]:
+    """Stored English topics, cached in-process; raises LookupError (never cached) when not generated yet."""
+    # Rows are written once per content id (generation returns early when one exists), so hits never go stale
     existing_content = db.get_generated_content(
         student_id=student_id,
         subject_id=subject_id,
         content_type='topics',
         difficulty_level=difficulty_level
     )
+    if not existing_content:
+        raise LookupError(subject_id)
+    topics_data = orjson.loads(existing_content['content_json'])
+    return tuple(Topic(title=topic['title'], description=topic.get('description', '')) for topic in topics_data)
+
+def generate_and_store_topics(student_id: int, subject_id: int, subject_name: str, 
+                             difficulty_level: str, user_context: str = None,
+                             wait_for_translation: bool = False) -> List[Topic]:
+    """Generate topics and store them persistently with automatic translation."""
+    logger.info(f"Generating topics for student {student_id}, subject {subject_id}")
     
-    if existing_content:
+    # Check if topics already exist
+    content_id = f"topics_{student_id}_{subject_id}_{difficulty_level}"
+    try:
+        existing_topics = _stored_topic_models(student_id, subject_id, difficulty_level)
+    except LookupError:
+        pass
+    else:
         logger.info(f"Using existing topics for {content_id}")
-        topics_data = json.loads(existing_content['content_json'])
-        return [Topic(title=topic['title'], description=topic.get('description', '')) for topic in topics_data]
+        return list(existing_topics)
     
     # Generate new topics
     topics = generate_topics(subject_name, difficulty_level, user_context)
@@ -195,34 +275,28 @@ def generate_and_store_topics(student_id: int, subject_id: int, subject_name: st
         subject_id=subject_id,
         content_type='topics',
         difficulty_level=difficulty_level,
-        content_json=json.dumps(topics_json)
+        content_json=orjson.dumps(topics_json).decode()
     )
     
-    # Queue Spanish translation
-    translation_service.queue_translation(content_id, 'es')
-    
-    # Trigger translation in background (non-blocking)
-    try:
-        translation_service.translate_content(content_id, 'es')
-        logger.info(f"Spanish translation completed for topics {content_id}")
-    except Exception as e:
-        logger.error(f"Spanish translation failed for topics {content_id}: {str(e)}")
+    # Spanish translation runs in the background unless the caller needs it in this response
+    _translate_content(content_id, wait=wait_for_translation)
     
     return topics
 
 def generate_chapters(topic: str, level: str) -> List[Chapter]:
     """Generates a list of Chapter objects for a given topic and level."""
     prompt = get_chapters_prompt(topic, level)
-    response = query_llm(prompt)
-    return _parse_chapters_response(response)
+    cache_key = normalize_cache_key("chapters", topic, level)
+    response = cached_llm(prompt, cache_key=cache_key)
+    chapters, parsed_json = _parse_chapters_response(response)
+    if not (parsed_json and chapters):
+        # A fallback or empty parse must not be replayed to every later student; ask the LLM again next time
+        forget_cached_llm(prompt, cache_key=cache_key)
+    return chapters
 
-def generate_and_store_chapters(student_id: int, subject_id: int, topic_title: str,
-                               difficulty_level: str) -> List[Chapter]:
-    """Generate chapters and store them persistently with automatic translation."""
-    logger.info(f"Generating chapters for student {student_id}, topic {topic_title}")
-    
-    # Check if chapters already exist
-    content_id = f"chapters_{student_id}_{subject_id}_{topic_title}_{difficulty_level}"
+@lru_cache(maxsize=256)
+def _stored_chapter_models(student_id: int, subject_id: int, topic_title: str, difficulty_level: str) -> Tuple[Chapter, ...]:
+    """Stored English chapters, cached in-process; raises LookupError (never cached) when not generated yet."""
     existing_content = db.get_generated_content(
         student_id=student_id,
         subject_id=subject_id,
@@ -230,11 +304,25 @@ def generate_and_store_chapters(student_id: int, subject_id: int, topic_title: s
         difficulty_level=difficulty_level,
         topic_title=topic_title
     )
+    if not existing_content:
+        raise LookupError(topic_title)
+    chapters_data = orjson.loads(existing_content['content_json'])
+    return tuple(Chapter(title=chapter['title'], content=chapter['content']) for chapter in chapters_data)
+
+def generate_and_store_chapters(student_id: int, subject_id: int, topic_title: str,
+                               difficulty_level: str, wait_for_translation: bool = False) -> List[Chapter]:
+    """Generate chapters and store them persistently with automatic translation."""
+    logger.info(f"Generating chapters for student {student_id}, topic {topic_title}")
     
-    if existing_content:
+    # Check if chapters already exist
+    content_id = f"chapters_{student_id}_{subject_id}_{topic_title}_{difficulty_level}"
+    try:
+        existing_chapters = _stored_chapter_models(student_id, subject_id, topic_title, difficulty_level)
+    except LookupError:
+        pass
+    else:
         logger.info(f"Using existing chapters for {content_id}")
-        chapters_data = json.loads(existing_content['content_json'])
-        return [Chapter(title=chapter['title'], content=chapter['content']) for chapter in chapters_data]
+        return list(existing_chapters)
     
     # Generate new chapters
     chapters = generate_chapters(topic_title, difficulty_level)
@@ -247,30 +335,20 @@ def generate_and_store_chapters(student_id: int, subject_id: int, topic_title: s
         subject_id=subject_id,
         content_type='chapters',
         difficulty_level=difficulty_level,
-        content_json=json.dumps(chapters_json),
+        content_json=orjson.dumps(chapters_json).decode(),
         topic_title=topic_title
     )
     
-    # Queue Spanish translation
-    translation_service.queue_translation(content_id, 'es')
-    
-    # Trigger translation in background (non-blocking)
-    try:
-        translation_service.translate_content(content_id, 'es')
-        logger.info(f"Spanish translation completed for chapters {content_id}")
-    except Exception as e:
-        logger.error(f"Spanish translation failed for chapters {content_id}: {str(e)}")
+    # Spanish translation runs in the background unless the caller needs it in this response
+    _translate_content(content_id, wait=wait_for_translation)
     
     return chapters
 
 def _parse_subject_recommendations_response(response: str) -> List[Dict]:
     """Parse LLM response into subject recommendation objects."""
     try:
-        # Extract JSON from response
-        json_content = _extract_json_from_response(response)
-        
-        # Parse JSON
-        subjects_data = json.loads(json_content)
+        # Parse the JSON array out of the response
+        subjects_data = _decode_json_from_response(response)
         
         if not isinstance(subjects_data, list):
             raise ValueError("Expected JSON array of subject recommendations")
@@ -292,7 +370,7 @@ def _parse_subject_recommendations_response(response: str) -> List[Dict]:
         return subjects
         
     except (json.JSONDecodeError, ValueError, KeyError) as e:
-        print(f"Subject recommendations JSON parsing failed: {e}")
+        logger.warning("Subject recommendations JSON parsing failed: %s", e)
         # Return a fallback response
         return [{
             'name': 'General Studies',
@@ -312,19 +390,14 @@ def generate_paginated_chapter_content(chapter_title: str, topic_title: str, sub
     from backend.core.curriculum.prompts import get_detailed_chapter_content_prompt
     
     prompt = get_detailed_chapter_content_prompt(chapter_title, topic_title, subject_name, difficulty_level)
-    response = query_llm(prompt)
+    # Shared across students studying the same chapter at the same level
+    cache_key = normalize_cache_key("chapter_content", chapter_title, topic_title, subject_name, difficulty_level)
+    response = cached_llm(prompt, cache_key=cache_key)
     
     # Parse the JSON response directly - no fallbacks
     try:
-        # Clean up markdown code blocks if present
-        clean_response = response.strip()
-        if clean_response.startswith('```json'):
-            clean_response = clean_response[7:]  # Remove ```json
-        if clean_response.endswith('```'):
-            clean_response = clean_response[:-3]  # Remove ```
-        clean_response = clean_response.strip()
-        
-        chapter_data = json.loads(clean_response)
+        # Decode the JSON object in place; any ```json fence or surrounding text is skipped
+        chapter_data = _decode_json_from_response(response, '{')
         
         if not isinstance(chapter_data, dict):
             raise ValueError("LLM did not return a JSON object")
@@ -352,14 +425,17 @@ def generate_paginated_chapter_content(chapter_title: str, topic_title: str, sub
         }
         
     except (json.JSONDecodeError, ValueError, KeyError) as e:
-        # If JSON parsing fails, it means the LLM didn't follow instructions
+        # If JSON parsing fails, it means the LLM didn't follow instructions; don't
+        # keep serving that response from the cache, so a retry asks the LLM again
+        forget_cached_llm(prompt, cache_key=cache_key)
         raise HTTPException(
             status_code=500, 
             detail=f"LLM failed to generate proper JSON content: {str(e)}. Raw response: {response[:200]}..."
         )
 
 def generate_and_store_chapter_content(student_id: int, subject_id: int, chapter_title: str, 
-                                      topic_title: str, subject_name: str, difficulty_level: str) -> Dict:
+                                      topic_title: str, subject_name: str, difficulty_level: str,
+                                      wait_for_translation: bool = False) -> Dict:
     """Generate paginated chapter content and store it persistently with automatic translation."""
     logger.info(f"Generating chapter content for student {student_id}, chapter {chapter_title}")
     
@@ -376,9 +452,9 @@ def generate_and_store_chapter_content(student_id: int, subject_id: int, chapter
     
     if existing_content:
         logger.info(f"Using existing chapter content for {content_id}")
-        chapter_data = json.loads(existing_content['content_json'])
+        chapter_data = orjson.loads(existing_content['content_json'])
         return {
-            'pages': [chapter_data[f'page_{i}'] for i in range(1, 7)],
+            'pages': list(_page_getter(chapter_data)),
             'summary': chapter_data['chapter_summary']
         }
     
@@ -386,15 +462,8 @@ def generate_and_store_chapter_content(student_id: int, subject_id: int, chapter
     content_result = generate_paginated_chapter_content(chapter_title, topic_title, subject_name, difficulty_level)
     
     # Prepare content for storage
-    chapter_content_json = {
-        'page_1': content_result['pages'][0],
-        'page_2': content_result['pages'][1],
-        'page_3': content_result['pages'][2],
-        'page_4': content_result['pages'][3],
-        'page_5': content_result['pages'][4],
-        'page_6': content_result['pages'][5],
-        'chapter_summary': content_result['summary']
-    }
+    chapter_content_json = dict(zip(_PAGE_KEYS, content_result['pages']))
+    chapter_content_json['chapter_summary'] = content_result['summary']
     
     # Store the generated content
     db.save_generated_content(
@@ -403,20 +472,13 @@ def generate_and_store_chapter_content(student_id: int, subject_id: int, chapter
         subject_id=subject_id,
         content_type='chapter_detail',
         difficulty_level=difficulty_level,
-        content_json=json.dumps(chapter_content_json),
+        content_json=orjson.dumps(chapter_content_json).decode(),
         topic_title=topic_title,
         chapter_title=chapter_title
     )
     
-    # Queue Spanish translation
-    translation_service.queue_translation(content_id, 'es')
-    
-    # Trigger translation in background (non-blocking)
-    try:
-        translation_service.translate_content(content_id, 'es')
-        logger.info(f"Spanish translation completed for chapter content {content_id}")
-    except Exception as e:
-        logger.error(f"Spanish translation failed for chapter content {content_id}: {str(e)}")
+    # Spanish translation runs in the background unless the caller needs it in this response
+    _translate_content(content_id, wait=wait_for_translation)
     
     return content_result
 
@@ -457,6 +519,6 @@ def get_content_by_language(student_id: int, subject_id: int, content_type: str,
     )
     
     if original_content:
-        return json.loads(original_content['content_json'])
+        return orjson.loads(original_content['content_json'])
     
     return None
@@ -2,14 +2,29 @@
 # app/curriculum/llm_client.py
 
 import os
+import json
+import hashlib
+import threading
+from concurrent.futures import Future
 import requests
 from dotenv import load_dotenv
 
+from backend.core.cache import cache, LLM_RESPONSE, LLM_RESPONSE_TTL
+
 load_dotenv()
 
 BASE_LLM_URL = os.getenv("BASE_LLM_URL", "http://localhost:11434")  # Default Ollama port
 LLM_MODEL = os.getenv("LLM_MODEL", "hf.co/unsloth/gemma-3n-E2B-it-GGUF")  # Gemma 3n E2B IT model
 
+# Concurrent requests allowed against the model server; the rest queue here instead
+# of piling onto Ollama (which serializes them anyway) and timing out together
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Cache misses currently being answered, so identical concurrent calls share one request
+_pending = {}
+_pending_lock = threading.Lock()
+
 def query_llm(prompt: str) -> str:
     """Sends a prompt to Ollama and returns the response."""
     headers = {"Content-Type": "application/json"}
@@ -23,7 +38,8 @@ def query_llm(prompt: str) -> str:
     }
 
     try:
-        response = requests.post(f"{BASE_LLM_URL}/api/generate", headers=headers, json=data)
+        with _llm_slots:
+            response = requests.post(f"{BASE_LLM_URL}/api/generate", headers=headers, json=data)
         response.raise_for_status()
         
         json_response = response.json()
@@ -38,3 +54,83 @@ def query_llm(prompt: str) -> str:
         raise RuntimeError(f"Failed to connect to Ollama: {e}") from e
     except KeyError as e:
         raise RuntimeError(f"Unexpected Ollama API response format. Missing key: {e}") from e
+
+def query_llm_stream(prompt: str):
+    """Sends a prompt to Ollama and yields response chunks as they are generated."""
+    headers = {"Content-Type": "application/json"}
+    data = {
+        "model": LLM_MODEL,
+        "prompt": prompt,
+        "stream": True,
+        "options": {
+            "temperature": 0.7,
+        }
+    }
+
+    try:
+        # The slot is held for the whole stream: the model is busy until it finishes
+        with _llm_slots, requests.post(f"{BASE_LLM_URL}/api/generate", headers=headers, json=data, stream=True) as response:
+            response.raise_for_status()
+
+            # Ollama streams one JSON object per line until "done" is true
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                json_chunk = json.loads(line)
+                if "error" in json_chunk:
+                    raise RuntimeError(f"Ollama API returned an error. Details: {json_chunk['error']}")
+                if json_chunk.get("response"):
+                    yield json_chunk["response"]
+                if json_chunk.get("done"):
+                    break
+
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Failed to connect to Ollama: {e}") from e
+
+def normalize_cache_key(*parts) -> str:
+    """Case- and whitespace-insensitive key for inputs that should share one cached response."""
+    return "|".join(" ".join(str(part or "").split()).casefold() for part in parts)
+
+def _llm_cache_key(prompt: str, cache_key: str = None) -> str:
+    return LLM_RESPONSE + hashlib.sha256((cache_key or prompt).encode()).hexdigest()
+
+def cached_llm(prompt: str, ttl: int = LLM_RESPONSE_TTL, cache_key: str = None) -> str:
+    """query_llm memoized on the prompt hash (or on cache_key when the caller has a better identity)."""
+    key = _llm_cache_key(prompt, cache_key)
+    try:
+        hit = cache.get(key)
+    except Exception:
+        hit = None  # Cache unavailable: behave like query_llm
+    if hit is not None:
+        return hit
+
+    # Single-flight: the first caller for a key queries the LLM, the rest wait for its answer
+    with _pending_lock:
+        pending = _pending.get(key)
+        owner = pending is None
+        if owner:
+            pending = _pending[key] = Future()
+    if not owner:
+        return pending.result()
+
+    try:
+        response = query_llm(prompt)
+        try:
+            cache.set(key, response, ttl=ttl)
+        except Exception:
+            pass
+        pending.set_result(response)
+        return response
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+
+def forget_cached_llm(prompt: str, cache_key: str = None):
+    """Drop a cached response (e.g. one the caller couldn't parse) so the next call asks the LLM again."""
+    try:
+        cache.delete(_llm_cache_key(prompt, cache_key))
+    except Exception:
+        pass
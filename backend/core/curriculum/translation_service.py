@@ -4,16 +4,22 @@ Handles LLM-based translation of topics, chapters, and detailed content
 """
 
 import json
+import re
 import uuid
+import hashlib
 import logging
 from typing import Dict, Optional, List
 from .llm_client import query_llm
 from .prompts import get_translation_prompt
 from ..database import db
+from ..cache import cache, TRANSLATION, LLM_TTL
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Control characters that break JSON parsing of LLM output
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+
 class TranslationService:
     """Service for handling content translations."""
     
@@ -68,15 +74,31 @@ class TranslationService:
             content_type = content_data['content_type']
             original_content = content_data['content_json']
             
-            prompt = get_translation_prompt(content_type, original_content, target_language)
-            
-            # Call LLM for translation
-            response = query_llm(prompt)
+            # Identical source content (e.g. the same chapter generated for another
+            # student) reuses an earlier translation instead of calling the LLM again
+            memo_key = f"{TRANSLATION}{hashlib.sha256(f'{content_type}|{original_content}'.encode()).hexdigest()}:{target_language}"
+            try:
+                translated_content = cache.get(memo_key)
+            except Exception:
+                translated_content = None  # Cache unavailable: translate as usual
             
-            # Parse and validate the translation
-            translated_content = self._parse_translation_response(response, content_type)
-            if not translated_content:
-                raise ValueError("Failed to parse translation response")
+            if translated_content is None:
+                prompt = get_translation_prompt(content_type, original_content, target_language)
+                
+                # Call LLM for translation
+                response = query_llm(prompt)
+                
+                # Parse and validate the translation
+                translated_content = self._parse_translation_response(response, content_type)
+                if not translated_content:
+                    raise ValueError("Failed to parse translation response")
+                
+                try:
+                    cache.set(memo_key, translated_content, ttl=LLM_TTL)
+                except Exception:
+                    pass
+            else:
+                logger.info(f"Reusing memoized {target_language} translation for {content_id}")
             
             # Save the translation
             db.save_content_translation(
@@ -186,9 +208,8 @@ class TranslationService:
                 strategies.append(("extract_array", clean_response[first_bracket:last_bracket + 1]))
         
         # Strategy 4: Fix common JSON issues
-        import re
         # Remove control characters that break JSON
-        cleaned_chars = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', clean_response)
+        cleaned_chars = _CONTROL_CHARS_RE.sub(' ', clean_response)
         if cleaned_chars != clean_response:
             strategies.append(("clean_control_chars", cleaned_chars))
             
@@ -13,6 +13,15 @@ ROOT_DIR = Path(__file__).parent.parent.parent  # Go up to project root
 DB_PATH = ROOT_DIR / "data" / "ai_tutor.db"
 DB_PATH.parent.mkdir(exist_ok=True)
 
+# One-time data migrations applied so far are tracked in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+# Correlates a progress row "d" with the student_progress row being updated
+_SAME_PROGRESS_KEY = (
+    "d.student_id = student_progress.student_id AND d.subject_id = student_progress.subject_id "
+    "AND d.topic = student_progress.topic AND d.chapter = student_progress.chapter"
+)
+
 class DatabaseManager:
     """Manages all database operations for the AI Tutor application."""
     
@@ -198,11 +207,61 @@ class DatabaseManager:
                 
                 # Initialize default subjects
                 self._init_default_subjects(conn)
+                self._migrate(conn)
+                self._ensure_indexes(conn)
                 conn.commit()
             else:
-                # If tables exist, just ensure default subjects are present
+                # If tables exist, just ensure default subjects, migrations and indexes are present
                 self._init_default_subjects(conn)
+                self._migrate(conn)
+                self._ensure_indexes(conn)
                 conn.commit()
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Apply one-time data migrations newer than the database's user_version."""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+        if version < 1:
+            # Older databases may hold several progress rows per chapter, but the unique
+            # index needs one. Fold each group into its newest row, keeping a completion
+            # or the best quiz score recorded by any of them, then drop the rest.
+            conn.execute(f'''
+                UPDATE student_progress SET
+                    completed = (SELECT MAX(d.completed) FROM student_progress d WHERE {_SAME_PROGRESS_KEY}),
+                    quiz_score = (SELECT MAX(d.quiz_score) FROM student_progress d WHERE {_SAME_PROGRESS_KEY})
+                WHERE id IN (
+                    SELECT MAX(id) FROM student_progress
+                    GROUP BY student_id, subject_id, topic, chapter
+                    HAVING COUNT(*) > 1
+                )
+            ''')
+            conn.execute('''
+                DELETE FROM student_progress WHERE id NOT IN (
+                    SELECT MAX(id) FROM student_progress
+                    GROUP BY student_id, subject_id, topic, chapter
+                )
+            ''')
+
+        if version < SCHEMA_VERSION:
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _ensure_indexes(self, conn: sqlite3.Connection):
+        """Create indexes added after the initial schema (safe to run on every startup)."""
+        # One progress row per chapter (older duplicates are merged by _migrate); required for upserts
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_student_progress_chapter
+            ON student_progress (student_id, subject_id, topic, chapter)
+        ''')
+        
+        # Per-student quiz history and best-score lookups
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_quiz_results_student_quiz ON quiz_results (student_id, quiz_id)')
+        
+        # Case-insensitive subject name lookups (custom subject de-duplication)
+        try:
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_subjects_name_lower ON subjects (LOWER(name))')
+        except sqlite3.IntegrityError:
+            # Existing names differ only by case; index for lookups without enforcing uniqueness
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_subjects_name_lower ON subjects (LOWER(name))')
     
     def _init_default_subjects(self, conn: sqlite3.Connection):
         """Initialize default subjects from the design spec."""
@@ -400,6 +459,29 @@ class DatabaseManager:
             ''', (student_id, subject_id, topic_title, difficulty_level)).fetchone()
             return dict(row) if row else None
     
+    def get_quiz_with_difficulty(self, student_id: int, subject_id: int, topic_title: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Get the student's difficulty level for a subject and the quiz for that level in one query."""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT ssd.difficulty_level AS student_difficulty, q.*
+                FROM student_subject_difficulty ssd
+                LEFT JOIN quizzes q
+                    ON q.student_id = ssd.student_id AND q.subject_id = ssd.subject_id
+                    AND q.topic_title = ? AND q.difficulty_level = ssd.difficulty_level
+                WHERE ssd.student_id = ? AND ssd.subject_id = ?
+            ''', (topic_title, student_id, subject_id)).fetchone()
+            if row is None:
+                return None, None
+            quiz = dict(row)
+            difficulty_level = quiz.pop('student_difficulty')
+            return difficulty_level, quiz if quiz['id'] is not None else None
+    
+    def get_quiz_by_id(self, quiz_id: str) -> Optional[Dict]:
+        """Get a quiz by its ID."""
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT * FROM quizzes WHERE id = ?', (quiz_id,)).fetchone()
+            return dict(row) if row else None
+    
     def save_quiz_result(self, result_id: str, quiz_id: str, student_id: int, 
                         answers_json: str, score: int, percentage: float) -> str:
         """Save a quiz result."""
@@ -431,6 +513,39 @@ class DatabaseManager:
                 LIMIT 1
             ''', (student_id, quiz_id)).fetchone()
             return dict(row) if row else None
+    
+    def get_max_quiz_score(self, student_id: int, quiz_id: str) -> int:
+        """Get the highest score a student has achieved on a quiz (-1 if never attempted)."""
+        with self.get_connection() as conn:
+            return conn.execute('''
+                SELECT COALESCE(MAX(score), -1) FROM quiz_results
+                WHERE student_id = ? AND quiz_id = ?
+            ''', (student_id, quiz_id)).fetchone()[0]
+    
+    def get_quiz_results_with_best(self, student_id: int, quiz_id: str,
+                                   limit: int = None, offset: int = 0) -> List[Dict]:
+        """Get quiz results (newest first, optionally one page), each flagged with whether it matches the best score."""
+        with self.get_connection() as conn:
+            # The window is evaluated over all attempts before LIMIT/OFFSET applies
+            rows = conn.execute('''
+                SELECT id, score, percentage, submitted_at,
+                       score = MAX(score) OVER () AS is_best
+                FROM quiz_results
+                WHERE student_id = ? AND quiz_id = ?
+                ORDER BY submitted_at DESC
+                LIMIT ? OFFSET ?
+            ''', (student_id, quiz_id, -1 if limit is None else limit, offset)).fetchall()
+            return [dict(row) for row in rows]
+    
+    def get_quiz_results_summary(self, student_id: int, quiz_id: str) -> Dict:
+        """Get attempt count and best score/percentage for a quiz without fetching the history."""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*) AS total_attempts, MAX(score) AS best_score, MAX(percentage) AS best_percentage
+                FROM quiz_results
+                WHERE student_id = ? AND quiz_id = ?
+            ''', (student_id, quiz_id)).fetchone()
+            return dict(row)
 
     # Content and Translation methods
     
@@ -466,6 +581,34 @@ class DatabaseManager:
             ''', (student_id, subject_id, content_type, difficulty_level, topic_title, chapter_title)).fetchone()
             return dict(row) if row else None
     
+    def get_chapter_details_bulk(self, student_id: int, subject_id: int, topic_title: str,
+                                 difficulty_level: str, chapter_titles: List[str]) -> Dict[str, Dict]:
+        """Get English chapter detail content for several chapters in one query, keyed by chapter title."""
+        if not chapter_titles:
+            return {}
+        placeholders = ','.join('?' * len(chapter_titles))
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT chapter_title, content_json FROM generated_content
+                WHERE student_id = ? AND subject_id = ? AND content_type = 'chapter_detail'
+                AND topic_title = ? AND difficulty_level = ? AND chapter_title IN ({placeholders})
+            ''', (student_id, subject_id, topic_title, difficulty_level, *chapter_titles)).fetchall()
+            return {row['chapter_title']: json.loads(row['content_json']) for row in rows}
+    
+    def get_chapter_titles_with_details(self, student_id: int, subject_id: int, topic_title: str,
+                                        difficulty_level: str, chapter_titles: List[str]) -> set:
+        """Return the subset of chapter titles that already have English detail content (no content decoded)."""
+        if not chapter_titles:
+            return set()
+        placeholders = ','.join('?' * len(chapter_titles))
+        with self.get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT chapter_title FROM generated_content
+                WHERE student_id = ? AND subject_id = ? AND content_type = 'chapter_detail'
+                AND topic_title = ? AND difficulty_level = ? AND chapter_title IN ({placeholders})
+            ''', (student_id, subject_id, topic_title, difficulty_level, *chapter_titles)).fetchall()
+            return {row['chapter_title'] for row in rows}
+    
     def save_content_translation(self, translation_id: str, content_id: str, 
                                 language_code: str, translated_content_json: str,
                                 translation_status: str = 'completed') -> str:
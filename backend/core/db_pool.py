@@ -0,0 +1,119 @@
+"""
+SQLite connection pool for the AI Tutor application
+Reuses tuned connections across requests instead of opening one per query
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from backend.core.database import DB_PATH
+
+POOL_SIZE = 8        # Connections kept open between requests
+MAX_OVERFLOW = 8     # Extra short-lived connections allowed under burst load
+ACQUIRE_TIMEOUT = 30  # Seconds to wait for a free connection once overflow is exhausted
+
+# Applied once per connection, so hot pages stay in each connection's page cache
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply row factory and performance pragmas to a new connection."""
+    conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections with QueuePool-style overflow."""
+
+    def __init__(self, db_path: str = None, pool_size: int = POOL_SIZE, max_overflow: int = MAX_OVERFLOW):
+        self.db_path = db_path or str(DB_PATH)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self._idle = queue.Queue(maxsize=pool_size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return _configure(sqlite3.connect(self.db_path, check_same_thread=False))
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.pool_size + self.max_overflow
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a database connection")
+
+    def _release(self, conn: sqlite3.Connection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            # Overflow connection: close it instead of keeping it around
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error, then returns it to the pool."""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Close all idle connections (called on application shutdown)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+@contextmanager
+def immediate_tx(conn: sqlite3.Connection):
+    """Run a write transaction that takes SQLite's write lock up front (no deferred-to-write upgrade)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+# Global connection pool instance
+pool = ConnectionPool()
+get_pooled_conn = pool.connection
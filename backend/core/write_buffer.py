@@ -0,0 +1,92 @@
+"""
+Batched write buffer for the AI Tutor application
+Coalesces bursts of single-row inserts into one transaction per batch
+"""
+
+import asyncio
+from typing import List, Optional, Sequence, Tuple
+
+from backend.core.db_pool import get_pooled_conn, immediate_tx
+
+MAX_BATCH = 100        # Rows written per transaction at most
+FLUSH_INTERVAL = 0.05  # Seconds a building batch may wait for more rows
+
+class WriteBuffer:
+    """Queue rows for one INSERT statement and flush them with executemany."""
+
+    def __init__(self, sql: str, max_batch: int = MAX_BATCH, flush_interval: float = FLUSH_INTERVAL):
+        self.sql = sql
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        """Start the flush task on first use (needs the running event loop)."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def write(self, row: Sequence):
+        """Queue a row and wait until the batch containing it is committed."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        await future
+
+    def _write_batch(self, rows: List[Sequence]):
+        with get_pooled_conn() as conn, immediate_tx(conn):
+            conn.executemany(self.sql, rows)
+
+    async def _flush(self, batch: List[Tuple[Sequence, asyncio.Future]]):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_batch, [row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            if self._queue.empty():
+                # A lone write goes straight out; only a burst waits to coalesce
+                await self._flush(batch)
+                continue
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def close(self):
+        """Flush whatever is queued and stop the flush task (called on shutdown)."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+# Global buffer for quiz submissions
+quiz_result_buffer = WriteBuffer("""
+    INSERT INTO quiz_results (id, quiz_id, student_id, answers_json, score, percentage)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
@@ -6,11 +6,13 @@ Main application entry point for React + FastAPI architecture
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 import uvicorn
 from pathlib import Path
 import sys
 import os
+import logging
+from logging.handlers import RotatingFileHandler
 
 # Add the project root to Python path for imports
 project_root = Path(__file__).parent.parent
@@ -18,6 +20,19 @@ sys.path.insert(0, str(project_root))
 
 from backend.api import auth, students, subjects, camera
 from backend.core.database import db
+from backend.core.db_pool import pool
+from backend.core.cache import cache
+
+# Application logs go to a size-capped file; warnings and errors still reach the console
+_log_format = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+_log_handler = RotatingFileHandler(project_root / "data" / "ai_tutor.log", maxBytes=5 * 1024 * 1024, backupCount=3)
+_log_handler.setFormatter(_log_format)
+_console_handler = logging.StreamHandler()
+_console_handler.setLevel(logging.WARNING)
+_console_handler.setFormatter(_log_format)
+logging.getLogger("backend").addHandler(_log_handler)
+logging.getLogger("backend").addHandler(_console_handler)
+logging.getLogger("backend").setLevel(logging.INFO)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -25,7 +40,8 @@ app = FastAPI(
     description="Offline LLM Learning Platform API",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse  # C-level JSON encoding for every router
 )
 
 # Configure CORS for React frontend
@@ -68,10 +84,16 @@ async def startup_event():
     try:
         db.init_database()
         print("✅ Database initialized successfully")
+        cache.purge_expired()
     except Exception as e:
         print(f"❌ Database initialization failed: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled database connections on shutdown."""
+    pool.close()
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
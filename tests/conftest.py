@@ -0,0 +1,9 @@
+"""
+Shared pytest setup for the AI Tutor backend tests
+"""
+
+import sys
+from pathlib import Path
+
+# Same import root as backend/main.py
+sys.path.insert(0, str(Path(__file__).parent.parent))
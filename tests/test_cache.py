@@ -0,0 +1,90 @@
+"""
+Tests for the shared SQLite key-value cache
+"""
+
+import threading
+
+import pytest
+
+from backend.core import cache as cache_module
+from backend.core.cache import Cache
+
+@pytest.fixture
+def cache(tmp_path):
+    return Cache(str(tmp_path / "cache.db"))
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+def test_set_get_round_trip(cache):
+    cache.set("k", {"topics": [{"title": "Algebra"}], 1: "int key"})
+    assert cache.get("k") == {"topics": [{"title": "Algebra"}], "1": "int key"}
+    assert cache.get("missing", "default") == "default"
+
+def test_entry_expires_after_ttl(cache, clock):
+    cache.set("k", "v", ttl=10)
+    clock[0] += 9
+    assert cache.get("k") == "v"
+    assert cache.exists("k")
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert not cache.exists("k")
+
+def test_entry_without_ttl_never_expires(cache, clock):
+    cache.set("k", "v")
+    clock[0] += 10 ** 9
+    assert cache.get("k") == "v"
+
+def test_scan_skips_expired_entries(cache, clock):
+    cache.set("p:a", 1, ttl=5)
+    cache.set("p:b", 2)
+    cache.set("q:c", 3)
+    clock[0] += 10
+    assert cache.scan_prefix("p:") == {"b": 2}
+    assert cache.scan_keys("p:") == ["b"]
+
+def test_purge_expired_removes_only_expired(cache, clock):
+    cache.set("old", 1, ttl=5)
+    cache.set("live", 2, ttl=50)
+    clock[0] += 10
+    assert cache.purge_expired() == 1
+    assert cache.get("live") == 2
+
+def test_claim_only_once_while_live(cache, clock):
+    assert cache.claim("status", "generating", ttl=10)
+    assert not cache.claim("status", "generating", ttl=10)
+    # A different value replaces the entry
+    assert cache.claim("status", "error", ttl=10)
+    assert cache.claim("status", "generating", ttl=10)
+    # An expired claim can be taken again
+    clock[0] += 11
+    assert cache.claim("status", "generating", ttl=10)
+
+def test_claim_is_atomic_across_threads(cache):
+    workers = 16
+    barrier = threading.Barrier(workers)
+    results = []
+    lock = threading.Lock()
+
+    def claim():
+        barrier.wait()
+        won = cache.claim("status", "generating", ttl=60)
+        with lock:
+            results.append(won)
+
+    threads = [threading.Thread(target=claim) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+
+def test_delete_ignores_missing_keys(cache):
+    cache.set("a", 1)
+    cache.delete("a", "never-set")
+    assert cache.get("a") is None
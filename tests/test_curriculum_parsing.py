@@ -0,0 +1,24 @@
+"""
+Tests for pulling JSON out of LLM responses
+"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("requests")
+
+from backend.core.curriculum.curriculum_service import _decode_json_from_response
+
+def test_skips_bracketed_prose_before_the_array():
+    response = 'See [1] and [Note] first.\n[{"title": "Loops", "description": "for and while"}]\nDone [2]'
+    assert _decode_json_from_response(response) == [{"title": "Loops", "description": "for and while"}]
+
+def test_falls_back_to_first_array_when_none_holds_objects():
+    assert _decode_json_from_response("Nothing to add: [] (see [1])") == []
+
+def test_object_opener():
+    assert _decode_json_from_response('Sure! {"pages": ["a"]} hope this helps', '{') == {"pages": ["a"]}
+
+def test_raises_without_json():
+    with pytest.raises(ValueError):
+        _decode_json_from_response("No list here")
@@ -0,0 +1,39 @@
+"""
+Tests for student progress storage and its one-time migration
+"""
+
+import pytest
+
+from backend.core.database import DatabaseManager, SCHEMA_VERSION
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "ai_tutor.db"))
+
+def _progress(db):
+    with db.get_connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT chapter, completed, quiz_score FROM student_progress ORDER BY chapter"
+        )]
+
+def test_save_student_progress_keeps_latest_values(db):
+    db.save_student_progress(1, 1, "Topic", "Chapter", completed=True, quiz_score=90.0)
+    db.save_student_progress(1, 1, "Topic", "Chapter", completed=False, quiz_score=40.0)
+    assert _progress(db) == [("Chapter", 0, 40.0)]
+
+def test_migration_merges_duplicate_progress_rows(db):
+    with db.get_connection() as conn:
+        conn.execute("DROP INDEX idx_student_progress_chapter")
+        conn.execute("PRAGMA user_version = 0")
+        conn.executemany(
+            "INSERT INTO student_progress (student_id, subject_id, topic, chapter, completed, quiz_score) "
+            "VALUES (1, 1, 'Topic', ?, ?, ?)",
+            [("a", 1, None), ("a", 0, 80.0), ("a", 0, None), ("b", 0, 50.0)]
+        )
+
+    db.init_database()
+
+    # The completion and the best score survive in the one row kept per chapter
+    assert _progress(db) == [("a", 1, 80.0), ("b", 0, 50.0)]
+    with db.get_connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
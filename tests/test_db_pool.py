@@ -0,0 +1,105 @@
+"""
+Tests for the pooled SQLite connections
+"""
+
+import sqlite3
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+from backend.core import db_pool
+from backend.core.db_pool import ConnectionPool, immediate_tx
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), pool_size=2, max_overflow=1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+    yield pool
+    pool.close()
+
+def _count(pool) -> int:
+    with pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+def test_connections_are_configured(pool):
+    with pool.connection() as conn:
+        assert conn.row_factory is sqlite3.Row
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_idle_connection_is_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool._created == 1
+
+def test_commits_on_success_and_rolls_back_on_error(pool):
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (2)")
+            raise ValueError("boom")
+    assert _count(pool) == 1
+
+def test_overflow_connection_is_closed_on_release(pool):
+    with ExitStack() as stack:
+        conns = [stack.enter_context(pool.connection()) for _ in range(3)]
+        assert pool._created == 3
+    assert pool._created == 2
+    assert pool._idle.qsize() == 2
+    # One of the three was an overflow connection and has been closed
+    closed = 0
+    for conn in conns:
+        try:
+            conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            closed += 1
+    assert closed == 1
+
+def test_checkout_times_out_when_exhausted(pool, monkeypatch):
+    monkeypatch.setattr(db_pool, "ACQUIRE_TIMEOUT", 0.05)
+    with ExitStack() as stack:
+        for _ in range(3):
+            stack.enter_context(pool.connection())
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                pass
+
+def test_waiting_checkout_gets_released_connection(pool):
+    acquired = threading.Event()
+    with ExitStack() as stack:
+        held = [stack.enter_context(pool.connection()) for _ in range(3)]
+
+        def wait_for_connection():
+            with pool.connection():
+                acquired.set()
+
+        waiter = threading.Thread(target=wait_for_connection)
+        waiter.start()
+        assert not acquired.wait(0.1)
+        stack.close()  # Return all three; the two pooled ones become available
+        waiter.join(5)
+    assert acquired.is_set()
+    assert len(held) == 3
+
+def test_close_closes_idle_connections(pool):
+    with pool.connection() as conn:
+        pass
+    pool.close()
+    assert pool._created == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+def test_immediate_tx_commits_or_rolls_back(pool):
+    with pool.connection() as conn:
+        with immediate_tx(conn):
+            conn.execute("INSERT INTO items VALUES (1)")
+        with pytest.raises(ValueError):
+            with immediate_tx(conn):
+                conn.execute("INSERT INTO items VALUES (2)")
+                raise ValueError("boom")
+    assert _count(pool) == 1
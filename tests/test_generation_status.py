@@ -0,0 +1,49 @@
+"""
+Tests for the generation-status long-poll endpoint
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend.api import subjects
+from backend.core.cache import Cache, GEN_STATUS
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(subjects, "cache", cache)
+    return cache
+
+def test_wait_returns_status_when_generation_raises(cache):
+    async def run():
+        future = asyncio.get_running_loop().create_future()
+        subjects._inflight["failing-key"] = future
+        try:
+            waiter = asyncio.ensure_future(subjects.wait_generation_status("failing-key", timeout=5))
+            await asyncio.sleep(0)
+            future.set_exception(RuntimeError("LLM unavailable"))
+            return await asyncio.wait_for(waiter, timeout=5)
+        finally:
+            subjects._inflight.pop("failing-key", None)
+
+    payload = asyncio.run(run())
+    # _run_generation clears the status when a job fails, so nothing is left generating
+    assert payload["content_key"] == "failing-key"
+    assert payload["is_generating"] is False
+
+def test_wait_returns_current_status_on_timeout(cache):
+    cache.set(GEN_STATUS + "slow-key", "generating")
+
+    async def run():
+        subjects._inflight["slow-key"] = asyncio.get_running_loop().create_future()
+        try:
+            return await subjects.wait_generation_status("slow-key", timeout=0.05)
+        finally:
+            subjects._inflight.pop("slow-key", None)
+
+    payload = asyncio.run(run())
+    assert payload["status"] == "generating"
+    assert payload["is_generating"] is True
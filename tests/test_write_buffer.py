@@ -0,0 +1,119 @@
+"""
+Tests for the batched write buffer
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.core import write_buffer
+from backend.core.db_pool import ConnectionPool
+from backend.core.write_buffer import WriteBuffer
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "buffer.db"))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER UNIQUE)")
+    monkeypatch.setattr(write_buffer, "get_pooled_conn", pool.connection)
+    yield pool
+    pool.close()
+
+def _values(pool):
+    with pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT value FROM items"))
+
+def _recording(buffer: WriteBuffer):
+    """Record the size of every batch the buffer writes."""
+    batches = []
+    write_batch = buffer._write_batch
+
+    def record(rows):
+        batches.append(len(rows))
+        write_batch(rows)
+
+    buffer._write_batch = record
+    return batches
+
+def test_flushes_when_batch_is_full(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=3, flush_interval=30)
+    batches = _recording(buffer)
+
+    async def run():
+        # A full batch must not wait out the 30s interval
+        await asyncio.wait_for(asyncio.gather(*(buffer.write((i,)) for i in range(3))), timeout=5)
+        await buffer.close()
+
+    asyncio.run(run())
+    assert batches == [3]
+    assert _values(pool) == [0, 1, 2]
+
+def test_lone_write_does_not_wait_for_interval(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=100, flush_interval=30)
+    batches = _recording(buffer)
+
+    async def run():
+        await asyncio.wait_for(buffer.write((1,)), timeout=5)
+        await asyncio.wait_for(buffer.write((2,)), timeout=5)
+        await buffer.close()
+
+    asyncio.run(run())
+    assert batches == [1, 1]
+    assert _values(pool) == [1, 2]
+
+def test_flushes_partial_batch_after_interval(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=100, flush_interval=0.05)
+    batches = _recording(buffer)
+
+    async def run():
+        await asyncio.wait_for(asyncio.gather(buffer.write((1,)), buffer.write((2,))), timeout=5)
+        await buffer.close()
+
+    asyncio.run(run())
+    assert batches == [2]
+    assert _values(pool) == [1, 2]
+
+def test_splits_bursts_into_max_batch_sized_transactions(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=100, flush_interval=0.05)
+    batches = _recording(buffer)
+
+    async def run():
+        await asyncio.gather(*(buffer.write((i,)) for i in range(250)))
+        await buffer.close()
+
+    asyncio.run(run())
+    assert sum(batches) == 250
+    assert max(batches) <= 100
+    assert _values(pool) == list(range(250))
+
+def test_failed_batch_raises_in_every_writer_and_buffer_recovers(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=2, flush_interval=30)
+
+    async def run():
+        # Duplicate values violate the UNIQUE constraint, failing the whole batch
+        results = await asyncio.wait_for(
+            asyncio.gather(buffer.write((7,)), buffer.write((7,)), return_exceptions=True), timeout=5
+        )
+        await asyncio.wait_for(asyncio.gather(buffer.write((8,)), buffer.write((9,))), timeout=5)
+        await buffer.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, sqlite3.IntegrityError) for result in results)
+    assert _values(pool) == [8, 9]
+
+def test_close_flushes_queued_rows(pool):
+    buffer = WriteBuffer("INSERT INTO items (value) VALUES (?)", max_batch=100, flush_interval=30)
+
+    async def run():
+        writers = [asyncio.ensure_future(buffer.write((i,))) for i in range(5)]
+        await asyncio.sleep(0)  # Let the writers queue their rows
+        await asyncio.wait_for(buffer.close(), timeout=5)
+        await asyncio.gather(*writers)
+
+    asyncio.run(run())
+    assert _values(pool) == [0, 1, 2, 3, 4]
+
+def test_close_without_writes_is_a_no_op(pool):
+    asyncio.run(WriteBuffer("INSERT INTO items (value) VALUES (?)").close())